@@ -0,0 +1,245 @@
+# --- Airport data for ChronoQuest ---
+import gzip
+import hashlib
+import json
+import sys
+from array import array
+from math import isfinite
+
+import numpy as np
+
+from distance import distances_from
+
+# Characters read at a time when streaming a JSON array
+READ_CHUNK_SIZE = 1 << 16
+
+
+# --- Streaming ingest ---
+
+def iter_json_array(f):
+    """Yield the objects of a top-level JSON array one at a time, reading the file in chunks.
+
+    Used for airport data and, by analytics.py, for users.json.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def more():
+        nonlocal buf, pos, eof
+        chunk = f.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        # Drop what was already parsed so the buffer stays about one chunk long
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise json.JSONDecodeError('Unexpected end of JSON array', buf, pos)
+            more()
+            continue
+        ch = buf[pos]
+        if not started:
+            if ch != '[':
+                raise json.JSONDecodeError('Expected a JSON array', buf, pos)
+            started = True
+            pos += 1
+            continue
+        if ch == ']':
+            return
+        if ch != '{':
+            raise json.JSONDecodeError('JSON array entries must be objects', buf, pos)
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Most likely the object continues in the next chunk
+            if eof:
+                raise
+            more()
+            continue
+        yield obj
+        pos = end
+
+
+def iter_airport_records(path):
+    """Yield raw airport dicts from a JSON array file or a JSON Lines file (*.jsonl), without loading it whole."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if str(path).endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def _coordinate(value, limit):
+    """Return value as a float in [-limit, limit], or None if it isn't a usable coordinate."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if isfinite(value) and -limit <= value <= limit else None
+
+
+# --- Columnar storage ---
+
+class AirportTable:
+    """Airports stored column by column instead of as one dict per airport.
+
+    lat/lon/distance live in typed arrays and every other field in a list of interned strings (so repeated
+    values such as country names are stored once). Indexing or iterating materializes plain dicts on demand,
+    so callers keep working with the usual {'ICAO': ..., 'lat': ..., ...} shape.
+    """
+
+    NUMERIC = ('lat', 'lon', 'distance')
+
+    def __init__(self):
+        self.lat = array('d')
+        self.lon = array('d')
+        self.distance = array('l')
+        self.columns = {}  # field name -> list of values (None where a row lacks the field)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self._size))
+
+    @classmethod
+    def from_arrays(cls, lat, lon, distance, columns):
+        """Build a table from ready-made columns, e.g. arrays memory-mapped from a data snapshot (see snapshot.py)."""
+        table = cls()
+        table.lat, table.lon, table.distance = lat, lon, distance
+        table.columns = columns
+        table._size = len(lat)
+        return table
+
+    @property
+    def icao(self):
+        """The ICAO column (list of codes in row order)."""
+        return self.columns.get('ICAO', [])
+
+    def append(self, record, lat, lon):
+        """Add one validated airport (distance is filled in later by set_distances)."""
+        size = self._size
+        columns = self.columns
+        filled = 0
+        for name, value in record.items():
+            if name in self.NUMERIC:
+                continue
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = [None] * size
+            column.append(sys.intern(value) if type(value) is str else value)
+            filled += 1
+        if filled != len(columns):
+            # This row lacks some fields other rows have
+            for column in columns.values():
+                if len(column) == size:
+                    column.append(None)
+        self._size = size + 1
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.distance.append(0)
+
+    def set_distances(self, origin_lat, origin_lon):
+        """Compute every airport's distance (whole km, rounded down) from the origin in one vectorized batch."""
+        if self._size:
+            km = distances_from(origin_lat, origin_lon, np.frombuffer(self.lat), np.frombuffer(self.lon))
+            self.distance = array('l', km.astype(int).tolist())
+
+    def row(self, i):
+        """Return airport i as a dict."""
+        row = {name: column[i] for name, column in self.columns.items() if column[i] is not None}
+        # float()/int() turn NumPy scalars from snapshot arrays into JSON-serializable numbers
+        row['lat'] = float(self.lat[i])
+        row['lon'] = float(self.lon[i])
+        row['distance'] = int(self.distance[i])
+        return row
+
+
+def load_airport_table(path, origin_lat, origin_lon):
+    """Stream airports from path into an AirportTable and compute distances from the origin.
+
+    Rows without an ICAO code or with missing/invalid lat/lon are dropped. Returns (table, skipped_count).
+    """
+    table = AirportTable()
+    skipped = 0
+    for record in iter_airport_records(path):
+        if not isinstance(record, dict) or not record.get('ICAO'):
+            skipped += 1
+            continue
+        lat = _coordinate(record.get('lat'), 90)
+        lon = _coordinate(record.get('lon'), 180)
+        if lat is None or lon is None:
+            skipped += 1
+            continue
+        table.append(record, lat, lon)
+    table.set_distances(origin_lat, origin_lon)
+    return table, skipped
+
+
+# --- Registry ---
+
+class AirportRegistry:
+    """Airport table indexed once at startup, with O(1) lookups and a ready-to-send API payload.
+
+    - positions: ICAO -> row index (also the row/column in the distance matrix)
+    - by_iata: IATA -> row index (taken from an 'IATA' or 'code' field when present)
+    - json_body / gzip_body: the serialized list for /api/main/airports, plain and gzip-compressed
+    - etag: strong validator derived from the payload, so unchanged lists can be answered with 304
+
+    A data snapshot passes the payload in already serialized; the indexes are then built from the table's
+    columns without materializing a dict per airport.
+    """
+
+    def __init__(self, airports, json_body=None, gzip_body=None, etag=None):
+        self.airports = airports
+        self.positions = {}
+        self.by_iata = {}
+        if json_body is None:
+            parts = []
+            for i, a in enumerate(airports):
+                self.positions.setdefault(a['ICAO'], i)
+                iata = a.get('IATA') or a.get('code')
+                if iata:
+                    self.by_iata.setdefault(iata, i)
+                parts.append(json.dumps(a, separators=(',', ':')))
+            json_body = ('[' + ','.join(parts) + ']').encode('utf-8')
+        else:
+            for i, icao in enumerate(airports.icao):
+                self.positions.setdefault(icao, i)
+            no_codes = [None] * len(airports)
+            iata_column = airports.columns.get('IATA') or no_codes
+            code_column = airports.columns.get('code') or no_codes
+            for i, (iata, code) in enumerate(zip(iata_column, code_column)):
+                if iata or code:
+                    self.by_iata.setdefault(iata or code, i)
+
+        self.json_body = json_body
+        # mtime=0 keeps the compressed bytes identical across restarts and workers
+        self.gzip_body = gzip_body or gzip.compress(json_body, compresslevel=9, mtime=0)
+        self.etag = etag or hashlib.sha256(json_body).hexdigest()[:32]
+
+    def __len__(self):
+        return len(self.airports)
+
+    def get(self, icao):
+        """Return the airport with the given ICAO code, or None."""
+        i = self.positions.get(icao)
+        return None if i is None else self.airports[i]
+
+    def get_by_iata(self, iata):
+        """Return the airport with the given IATA code, or None."""
+        i = self.by_iata.get(iata)
+        return None if i is None else self.airports[i]
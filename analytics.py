@@ -0,0 +1,280 @@
+"""Offline analytics over ChronoQuest player records and game journals.
+
+Streams the user records (users.json, or the `users` table of a SQL backend) and the game journals written with
+CHRONO_JOURNAL=1 in chunks, aggregates the chunks on a pool of worker processes and writes one columnar file per
+table to --output-dir:
+
+    airport_visits   arrivals per airport
+    event_types      arrival events by type (as returned by /api/main/travel) and their share of all events
+    badges           players holding each badge, and how often it was earned per journaled game
+    fuel_win_rate    journaled games, wins, losses, quits and win rate per fuel type
+    players          totals over all accounts (games played, wins, losses)
+
+Only a few chunks are in flight at a time and every aggregate is keyed by airport, event type, badge or fuel type,
+so memory use stays flat however many players and games there are.
+
+Tables are NumPy .npz archives with one array per column (np.load('badges.npz')['badge']), or CSV files with
+--format csv.
+
+Usage:
+    python analytics.py --output-dir analytics/
+    python analytics.py --storage sqlite:///chronoquest.db --journal-dir /var/lib/chronoquest/journal --processes 8
+    python analytics.py --since 20261001 --until 20261031 --format csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from airports import iter_json_array
+from badges import default_catalog
+from engine import HOME
+from journal import read_journal
+from storage import open_user_store
+
+BASE = Path(__file__).parent
+USER_CHUNK_SIZE = 5000
+JOURNAL_CHUNK_SIZE = 200
+
+# Columns of every output table, with their NumPy types
+TABLES = {
+    'airport_visits': [('ICAO', str), ('visits', np.int64), ('share', np.float64)],
+    'event_types': [('event', str), ('count', np.int64), ('share', np.float64)],
+    'badges': [('badge', str), ('name', str), ('players', np.int64), ('player_rate', np.float64),
+               ('earned_in_games', np.int64), ('per_game_rate', np.float64)],
+    'fuel_win_rate': [('fuel', str), ('games', np.int64), ('wins', np.int64), ('losses', np.int64),
+                      ('quits', np.int64), ('unfinished', np.int64), ('win_rate', np.float64)],
+    'players': [('accounts', np.int64), ('games_played', np.int64), ('wins', np.int64), ('losses', np.int64),
+                ('win_rate', np.float64), ('journaled_games', np.int64), ('damaged_journals', np.int64)],
+}
+
+
+def new_totals():
+    return {'players': Counter(), 'badge_holders': Counter(), 'airport_visits': Counter(), 'event_types': Counter(),
+            'badges_earned': Counter(), 'fuel_results': Counter()}
+
+
+def merge(totals, part):
+    for name, counter in part.items():
+        totals[name].update(counter)
+
+
+def summarize_users(users):
+    """Worker: aggregate one chunk of user records."""
+    totals = new_totals()
+    players = totals['players']
+    for user in users:
+        players['accounts'] += 1
+        players['games_played'] += user.get('playerHowManyTimesPlayed') or 0
+        players['wins'] += user.get('playerHowManyWins') or 0
+        players['losses'] += user.get('playerHowManyLoses') or 0
+        totals['badge_holders'].update(set(user.get('playerBadges') or []))
+    return totals
+
+
+def summarize_game(path):
+    """Aggregate one journal file into a totals dict (counting one game)."""
+    totals = new_totals()
+    records = read_journal(path)
+    start = next(records)
+    result = 'unfinished'
+    for record in records:
+        kind = record['type']
+        if kind == 'quit':
+            result = 'quit'
+            continue
+        if kind not in ('travel', 'actions'):
+            continue
+        events = [event['type'] for event in record.get('events', ())]
+        totals['event_types'].update(events)
+        totals['badges_earned'].update(record.get('badges') or ())
+        if kind == 'travel':
+            destinations = [record['args'].get('ICAO')]
+        else:
+            actions = record['args'].get('actions', [])[:record.get('applied')]
+            destinations = [action.get('ICAO') for action in actions if action.get('type') == 'travel']
+        # A trip home without the shards and fluxfire to win doesn't move the player
+        for _ in range(events.count('efhk_requirements_not_met')):
+            destinations.remove(HOME)
+        totals['airport_visits'].update(filter(None, destinations))
+        if record.get('end'):
+            result = record['end']
+    totals['fuel_results'][(start['state'].get('fuel_to_make'), result)] += 1
+    totals['players']['journaled_games'] += 1
+    return totals
+
+
+def summarize_journals(paths):
+    """Worker: aggregate the games in one chunk of journal files. Unreadable journals are counted, not fatal."""
+    totals = new_totals()
+    for path in paths:
+        try:
+            game = summarize_game(path)
+        except (OSError, ValueError, KeyError, StopIteration):
+            totals['players']['damaged_journals'] += 1
+            continue
+        merge(totals, game)
+    return totals
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bounded_map(pool, fn, chunks, window):
+    """Like pool.map over a lazy iterable, but with at most `window` chunks submitted at a time (pool.map would
+    read and submit every chunk up front)."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_user_chunks(args):
+    """Chunks of user records from users.json (streamed, never loaded whole) or from a SQL backend.
+
+    A missing users.json means no accounts yet (like a missing journal directory), so it yields nothing.
+    """
+    if args.storage:
+        yield from open_user_store(args.storage, base=BASE).iter_batches(args.user_chunk_size)
+        return
+    try:
+        f = open(args.users, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        yield from chunked(iter_json_array(f), args.user_chunk_size)
+
+
+def iter_journal_paths(directory, since=None, until=None):
+    """Journal files under directory, one day directory (YYYYMMDD) at a time."""
+    try:
+        days = sorted(entry.name for entry in os.scandir(directory) if entry.is_dir())
+    except FileNotFoundError:
+        return
+    for day in days:
+        if (since and day < since) or (until and day > until):
+            continue
+        with os.scandir(os.path.join(directory, day)) as entries:
+            for entry in entries:
+                if entry.name.endswith('.jsonl'):
+                    yield entry.path
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def build_tables(totals):
+    """Turn the merged totals into table rows (dicts keyed by column name)."""
+    players = totals['players']
+    accounts = players['accounts']
+    games = players['journaled_games']
+    visits = sum(totals['airport_visits'].values())
+    events = sum(totals['event_types'].values())
+    info = default_catalog().info
+
+    fuels = {}
+    for (fuel, result), count in totals['fuel_results'].items():
+        row = fuels.setdefault(fuel or '', {'fuel': fuel or '', 'games': 0, 'wins': 0, 'losses': 0, 'quits': 0,
+                                            'unfinished': 0})
+        row['games'] += count
+        row[{'win': 'wins', 'lose': 'losses', 'quit': 'quits'}.get(result, 'unfinished')] += count
+    for row in fuels.values():
+        row['win_rate'] = _rate(row['wins'], row['wins'] + row['losses'])
+
+    badge_ids = sorted(set(totals['badge_holders']) | set(totals['badges_earned']))
+    return {
+        'airport_visits': [{'ICAO': icao, 'visits': n, 'share': _rate(n, visits)}
+                           for icao, n in totals['airport_visits'].most_common()],
+        'event_types': [{'event': event, 'count': n, 'share': _rate(n, events)}
+                        for event, n in totals['event_types'].most_common()],
+        'badges': [{'badge': badge, 'name': info.get(badge, {}).get('name', badge),
+                    'players': totals['badge_holders'][badge],
+                    'player_rate': _rate(totals['badge_holders'][badge], accounts),
+                    'earned_in_games': totals['badges_earned'][badge],
+                    'per_game_rate': _rate(totals['badges_earned'][badge], games)} for badge in badge_ids],
+        'fuel_win_rate': sorted(fuels.values(), key=lambda row: row['fuel']),
+        'players': [{'accounts': accounts, 'games_played': players['games_played'], 'wins': players['wins'],
+                     'losses': players['losses'], 'win_rate': _rate(players['wins'], players['games_played']),
+                     'journaled_games': games, 'damaged_journals': players['damaged_journals']}],
+    }
+
+
+def write_table(output_dir, name, rows, fmt):
+    """Write one table as a .npz archive (one array per column) or a .csv file; returns its path."""
+    columns = TABLES[name]
+    if fmt == 'csv':
+        path = output_dir / f'{name}.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=[column for column, _ in columns])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        path = output_dir / f'{name}.npz'
+        np.savez_compressed(path, **{column: np.asarray([row[column] for row in rows], dtype=dtype)
+                                     for column, dtype in columns})
+    return path
+
+
+def main(argv=None):
+    cache_dir = Path(os.environ.get('CHRONO_CACHE_DIR', BASE / '.cache'))
+    parser = argparse.ArgumentParser(description='Aggregate ChronoQuest player records and game journals.')
+    parser.add_argument('--users', help='users.json to read (default: next to this script)')
+    parser.add_argument('--storage', help='read users from a SQL backend instead, e.g. sqlite:///chronoquest.db')
+    parser.add_argument('--journal-dir', default=os.environ.get('CHRONO_JOURNAL_DIR', cache_dir / 'journal'),
+                        help='game journals (default: CHRONO_JOURNAL_DIR or .cache/journal)')
+    parser.add_argument('--since', help='first journal day to include (YYYYMMDD)')
+    parser.add_argument('--until', help='last journal day to include (YYYYMMDD)')
+    parser.add_argument('--output-dir', default='analytics', help='where the tables are written (default: analytics)')
+    parser.add_argument('--format', choices=['npz', 'csv'], default='npz')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--user-chunk-size', type=int, default=USER_CHUNK_SIZE)
+    parser.add_argument('--journal-chunk-size', type=int, default=JOURNAL_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.storage and args.storage.startswith('json'):
+        parser.error('use --users for users.json; --storage is for SQL backends')
+    if args.users is None:
+        args.users = BASE / 'users.json'
+    elif not os.path.isfile(args.users):
+        parser.error(f'--users: no such file: {args.users}')
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    totals = new_totals()
+    window = 2 * args.processes
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        for part in bounded_map(pool, summarize_users, iter_user_chunks(args), window):
+            merge(totals, part)
+        journals = chunked(iter_journal_paths(args.journal_dir, args.since, args.until), args.journal_chunk_size)
+        for part in bounded_map(pool, summarize_journals, journals, window):
+            merge(totals, part)
+
+    tables = build_tables(totals)
+    files = [str(write_table(output_dir, name, rows, args.format)) for name, rows in tables.items()]
+    print(json.dumps({'players': tables['players'][0], 'files': files,
+                      'seconds': round(time.perf_counter() - started, 2)}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,559 @@
+"""Asyncio (ASGI) entry point for ChronoQuest.
+
+Serves the same JSON API as app.py (/api/user/*, /api/main/*, /api/buy/*) with the same request and response
+bodies, on an event loop instead of one thread per request. Game rules come from engine.py and every helper,
+setting and store is shared with app.py (it is imported, not copied); the blocking parts run off the loop:
+storage calls on a dedicated thread pool and password hashing on the PasswordHasher pool.
+
+Session cookies use the same format and secret as the Flask app, so the HTML pages can keep being served by
+app.py (e.g. behind a proxy that sends /api/ to this process) and a logged-in player works against either.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import os
+import secrets
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.cookies import SimpleCookie
+from math import ceil
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadSignature, Signer
+from werkzeug.http import parse_accept_header, parse_etags
+
+sys.path.insert(0, str(Path(__file__).parent))
+import app as chrono
+import engine
+from auth import HasherBusy
+from journal import Turn, state_checksum
+from push import PlayerStream
+from session_store import ServerSideSessionInterface
+from state_codec import decode_state, pack_state
+from storage import user_key
+
+# Threads for blocking storage calls; they only wait on disk or the database, so more than CPUs is fine
+STORAGE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('CHRONO_ASGI_STORAGE_THREADS', '16')),
+                                      thread_name_prefix='asgi-storage')
+
+
+async def in_storage(fn, *args, **kwargs):
+    """Run a blocking storage helper on the storage pool and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(STORAGE_EXECUTOR, partial(fn, *args, **kwargs))
+
+
+# --- Sessions (compatible with the Flask app's cookies) ---
+
+class Sessions:
+    """Reads and writes sessions exactly like app.py: signed cookies, or signed ids into the server-side cache."""
+
+    def __init__(self, flask_app, cache):
+        config = flask_app.config
+        self.cache = cache
+        self.cookie_name = config['SESSION_COOKIE_NAME']
+        self.max_age = int(config['PERMANENT_SESSION_LIFETIME'].total_seconds())
+        attributes = [f"Path={config['SESSION_COOKIE_PATH'] or '/'}"]
+        if config['SESSION_COOKIE_DOMAIN']:
+            attributes.append(f"Domain={config['SESSION_COOKIE_DOMAIN']}")
+        if config['SESSION_COOKIE_HTTPONLY']:
+            attributes.append('HttpOnly')
+        if config['SESSION_COOKIE_SECURE']:
+            attributes.append('Secure')
+        if config['SESSION_COOKIE_SAMESITE']:
+            attributes.append(f"SameSite={config['SESSION_COOKIE_SAMESITE']}")
+        self.attributes = '; '.join(attributes)
+        if cache is None:
+            self.serializer = SecureCookieSessionInterface().get_signing_serializer(flask_app)
+        else:
+            self.signer = Signer(flask_app.secret_key, salt=ServerSideSessionInterface.salt)
+
+    def load(self, cookie):
+        """Return (sid, data) for a cookie value; sid is None for cookie sessions."""
+        if self.cache is None:
+            if cookie:
+                try:
+                    return None, dict(self.serializer.loads(cookie, max_age=self.max_age))
+                except BadSignature:
+                    pass
+            return None, {}
+        if cookie:
+            try:
+                sid = self.signer.unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.cache.get(sid)
+                if data is not None:
+                    return sid, dict(data)
+        return secrets.token_urlsafe(32), {}
+
+    def set_cookie_header(self, sid, data):
+        """Store a modified session and return the Set-Cookie header value for it."""
+        if not data:
+            if sid is not None:
+                self.cache.delete(sid)
+            return f'{self.cookie_name}=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Max-Age=0; {self.attributes}'
+        if self.cache is None:
+            value = self.serializer.dumps(data)
+        else:
+            self.cache.set(sid, data)
+            value = self.signer.sign(sid).decode('ascii')
+        return f'{self.cookie_name}={value}; {self.attributes}'
+
+
+SESSIONS = Sessions(chrono.app, chrono.SESSION_CACHE)
+
+
+# --- Requests and responses ---
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.body = body
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        cookies = SimpleCookie(self.headers.get('cookie', ''))
+        cookie = cookies.get(SESSIONS.cookie_name)
+        self.sid, self.session = SESSIONS.load(cookie.value if cookie else None)
+        self.session_modified = False
+        client = scope.get('client')
+        self.remote_addr = client[0] if client else None
+
+    def json(self):
+        return json.loads(self.body or b'null') or {}
+
+    def set_session(self, key, value):
+        self.session[key] = value
+        self.session_modified = True
+
+    def pop_session(self, key):
+        if key in self.session:
+            del self.session[key]
+            self.session_modified = True
+
+
+class Response:
+    def __init__(self, body=b'', status=200, content_type='application/json', headers=None):
+        self.body = body
+        self.status = status
+        self.headers = {'content-type': content_type, **(headers or {})}
+
+
+class StreamingResponse(Response):
+    """A response whose body is an async iterator of text chunks, sent as they are produced."""
+
+    def __init__(self, chunks, status=200, content_type='text/event-stream', headers=None):
+        super().__init__(b'', status, content_type, headers)
+        self.chunks = chunks
+
+
+def json_response(payload, status=200, headers=None):
+    # Same output as Flask's jsonify in production: sorted keys, compact separators
+    return Response(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8'), status,
+                    headers=headers)
+
+
+def too_many_attempts(wait):
+    return json_response({'ok': False, 'error': 'Too many attempts, try again later'}, 429,
+                         {'retry-after': str(ceil(min(wait, 3600)))})
+
+
+def hasher_busy():
+    return json_response({'ok': False, 'error': 'Server busy, try again'}, 503, {'retry-after': '1'})
+
+
+ROUTES = {}
+
+
+def route(method, path, login=False):
+    """Register an async handler; login=True answers 401 when the session has no username (like login_required)."""
+    def decorator(handler):
+        async def guarded(request):
+            if login and 'username' not in request.session:
+                return json_response({'error': 'not logged in'}, 401)
+            return await handler(request)
+        ROUTES[(method, path)] = guarded
+        return handler
+    return decorator
+
+
+# --- API: authentication ---
+
+@route('POST', '/api/user/check')
+async def user_check(request):
+    name = request.json().get('name')
+    return json_response({'exists': await in_storage(chrono.USERNAMES.__contains__, name)})
+
+
+@route('POST', '/api/user/login')
+async def user_login(request):
+    data = request.json()
+    name = data.get('name')
+    password = data.get('password')
+
+    wait = max(chrono.LOGIN_IP_LIMITER.allow(request.remote_addr), chrono.LOGIN_USER_LIMITER.allow(user_key(name)))
+    if wait:
+        return too_many_attempts(wait)
+
+    user = await in_storage(chrono.find_user, name)
+    try:
+        valid = user is not None and await asyncio.wrap_future(
+            chrono.HASHER.submit_verify(user['playerPasswordHash'], password))
+    except HasherBusy:
+        return hasher_busy()
+    if not valid:
+        return json_response({'ok': False, 'error': 'Wrong password'})
+
+    request.set_session('username', name)
+    if chrono.HASHER.needs_rehash(user['playerPasswordHash']):
+        stored_name = user['playerName']
+        chrono.HASHER.hash_later(password,
+                                 lambda new_hash: chrono.USER_STORE.update(stored_name, playerPasswordHash=new_hash))
+    # Always start a brand-new game on login and clear the persisted save
+    new_gs = engine.new_game_state(name)
+    await start_game(request, name, new_gs)
+    chrono.PUSH.publish_state(name, new_gs, state_version(request))
+    await in_storage(chrono.persist_game_state, name, None)
+    return json_response({'ok': True})
+
+
+@route('POST', '/api/user/register')
+async def user_register(request):
+    data = request.json()
+    name = data.get('name')
+    password = data.get('password')
+
+    wait = chrono.LOGIN_IP_LIMITER.allow(request.remote_addr)
+    if wait:
+        return too_many_attempts(wait)
+    if await in_storage(chrono.USERNAMES.__contains__, name):
+        return json_response({'ok': False, 'error': 'User already exists'})
+    try:
+        password_hash = await asyncio.wrap_future(chrono.HASHER.submit_hash(password))
+    except HasherBusy:
+        return hasher_busy()
+
+    if not await in_storage(chrono.USER_STORE.add, chrono.new_user_record(name, password_hash)):
+        return json_response({'ok': False, 'error': 'User already exists'})
+    chrono.USERNAMES.add(name)
+    request.set_session('username', name)
+    await start_game(request, name, engine.new_game_state(name))
+    return json_response({'ok': True})
+
+
+@route('POST', '/api/user/logout')
+async def user_logout(request):
+    request.pop_session('username')
+    request.pop_session('game_state')
+    request.pop_session('game_id')
+    return json_response({'ok': True})
+
+
+@route('GET', '/api/user/badges', login=True)
+async def user_badges(request):
+    user = await in_storage(chrono.find_user, request.session['username'])
+    return json_response({'playerBadges': [chrono.BADGE_CATALOG.label(b) for b in user.get('playerBadges', [])]})
+
+
+@route('GET', '/api/leaderboard')
+async def leaderboard(request):
+    payload, status = await in_storage(chrono.leaderboard_payload, request.args, request.session.get('username'))
+    return json_response(payload, status)
+
+
+# --- API: game ---
+
+def game_state(request):
+    return decode_state(request.session.get('game_state'))
+
+
+def save_game_state(request, gs):
+    """Same as app.save_game_state: store the compact state and move to the next state version."""
+    request.set_session('game_state', pack_state(gs))
+    request.set_session('state_version', state_version(request) + 1)
+
+
+def state_version(request):
+    return request.session.get('state_version', 0)
+
+
+async def start_game(request, username, gs):
+    """Same as app.start_game; the journal is opened on the storage pool."""
+    save_game_state(request, gs)
+    game_id = await in_storage(chrono.journal_start, username, gs) if chrono.JOURNAL is not None else None
+    if game_id:
+        request.set_session('game_id', game_id)
+    else:
+        request.pop_session('game_id')
+
+
+def known_state_version(request):
+    return chrono.known_state_version(request.headers.get(chrono.VERSION_HEADER.lower()))
+
+
+def is_streaming(request):
+    """Same as app.is_streaming: the request names one of the player's open streams in this process."""
+    return chrono.PUSH.is_streaming(request.session.get('username'),
+                                    request.headers.get(chrono.STREAM_HEADER.lower()))
+
+
+async def apply_effects(request, gs, effects, entry=None):
+    """Session side of engine effects here, storage side (and the journal entry) on the storage pool (see
+    app.apply_effects and app.store_effects)."""
+    game_id = request.session.get('game_id') if entry is not None else None
+    if game_id:
+        entry = {**entry, 'base': state_checksum(game_state(request) or {})}
+    if any(effect['type'] == 'save' for effect in effects):
+        save_game_state(request, gs)
+    return await in_storage(chrono.store_effects, request.session['username'], gs, effects, game_id, entry)
+
+
+def action_response(request, gs, base, outcome, badges, **fields):
+    """Same as app.action_response."""
+    version = state_version(request)
+    chrono.push_outcome(request.session['username'], gs, outcome, badges, base, version)
+    if is_streaming(request):
+        ack = {'ok': True, 'streamed': True, 'win': outcome['win'], 'lose': outcome['lose']}
+        if 'applied' in outcome:
+            ack['applied'] = outcome['applied']
+        return json_response(ack)
+    return json_response({**fields, **chrono.state_payload(gs, outcome['state'], base, version,
+                                                           known_state_version(request))})
+
+
+async def current_game_state(request):
+    gs = game_state(request)
+    if gs:
+        return gs
+    username = request.session['username']
+    fresh = engine.new_game_state(username)
+    await start_game(request, username, fresh)
+    await in_storage(chrono.persist_game_state, username, None)
+    return fresh
+
+
+@route('GET', '/api/main/state', login=True)
+async def main_state(request):
+    gs = await current_game_state(request)
+    version = state_version(request)
+    if known_state_version(request) == version:
+        return json_response({'patch': [], 'version': version})
+    return json_response({'state': chrono.client_state(gs), 'version': version})
+
+
+@route('GET', '/api/main/stream', login=True)
+async def main_stream(request):
+    username = request.session['username']
+    gs = await current_game_state(request)
+    version = state_version(request)
+
+    async def chunks():
+        subscription = chrono.PUSH.subscribe(username, asyncio.get_running_loop())
+        stream = PlayerStream(subscription, gs, version)
+        try:
+            for chunk in stream.opening():
+                yield chunk
+            while not subscription.closed:
+                message = await subscription.next(stream.wait_time())
+                for chunk in (stream.handle(message) if message is not None else stream.idle()):
+                    yield chunk
+        finally:
+            chrono.PUSH.unsubscribe(subscription)
+
+    return StreamingResponse(chunks(), headers={'cache-control': 'no-cache', 'x-accel-buffering': 'no'})
+
+
+@route('GET', '/api/main/airports', login=True)
+async def main_airports(request):
+    registry = chrono.AIRPORT_REGISTRY
+    # Quality-aware like Flask's request.accept_encodings: 'gzip;q=0' (or '*;q=0') refuses gzip
+    gzip_ok = parse_accept_header(request.headers.get('accept-encoding'))['gzip'] > 0
+    tag = f'{registry.etag}-gz' if gzip_ok else registry.etag
+    headers = {'etag': f'"{tag}"', 'vary': 'Accept-Encoding', 'cache-control': 'private, no-cache'}
+    # Like make_conditional in app.py: '*' and weak validators (W/"...", e.g. from a proxy) match too
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(tag):
+        return Response(status=304, headers=headers)
+    if gzip_ok:
+        headers['content-encoding'] = 'gzip'
+        return Response(registry.gzip_body, headers=headers)
+    return Response(registry.json_body, headers=headers)
+
+
+@route('GET', '/api/main/airports/nearby', login=True)
+async def main_airports_nearby(request):
+    payload, status = chrono.find_nearby_airports(game_state(request) or {}, request.args)
+    return json_response(payload, status)
+
+
+@route('GET', '/api/main/plan', login=True)
+async def main_plan(request):
+    # Planning is CPU-bound (up to CHRONO_PLAN_BUDGET_MS); keep it off the event loop
+    payload, status = await in_storage(chrono.plan_payload, game_state(request) or {}, request.args)
+    return json_response(payload, status)
+
+
+@route('POST', '/api/main/travel', login=True)
+async def main_travel(request):
+    username = request.session['username']
+    player = await in_storage(chrono.player_facts, username)
+    gs = game_state(request)
+    base = state_version(request)
+    icao = request.json().get('ICAO')
+    turn = Turn()
+    outcome = engine.travel(gs, icao, turn.rng, chrono.travel_cost, clock=turn.clock, catalog=chrono.BADGE_CATALOG,
+                            player=player)
+    if not outcome['ok']:
+        return json_response({'events': outcome['events'], 'state': chrono.client_state(outcome['state']),
+                              'win': False, 'lose': False, 'ok': False, 'error': outcome['error']}, 400)
+    badges = await apply_effects(request, outcome['state'], outcome['effects'],
+                                 chrono.journal_entry('travel', {'ICAO': icao}, outcome, turn))
+    return action_response(request, gs, base, outcome, badges, events=outcome['events'], win=outcome['win'],
+                           lose=outcome['lose'])
+
+
+@route('POST', '/api/main/actions', login=True)
+async def main_actions(request):
+    actions = request.json().get('actions')
+    limit = chrono.MAX_BATCH_ACTIONS
+    if (not isinstance(actions, list) or not 1 <= len(actions) <= limit
+            or not all(isinstance(action, dict) for action in actions)):
+        return json_response({'ok': False, 'error': f'actions must be a list of 1 to {limit} actions'}, 400)
+
+    username = request.session['username']
+    player = await in_storage(chrono.player_facts, username)
+    gs = game_state(request)
+    base = state_version(request)
+    turn = Turn()
+    outcome = engine.apply_actions(gs, actions, turn.rng, chrono.travel_cost, clock=turn.clock,
+                                   catalog=chrono.BADGE_CATALOG, player=player)
+    if not outcome['ok']:
+        return json_response({'ok': False, 'error': outcome['error'], 'failed': outcome['failed'],
+                              'events': outcome['events']}, 400)
+    badges = await apply_effects(request, outcome['state'], outcome['effects'],
+                                 chrono.journal_entry('actions', {'actions': actions}, outcome, turn))
+    return action_response(request, gs, base, outcome, badges, ok=True, applied=outcome['applied'],
+                           results=outcome['results'], win=outcome['win'], lose=outcome['lose'])
+
+
+@route('POST', '/api/buy/credits', login=True)
+async def buy_credits(request):
+    gs = game_state(request)
+    base = state_version(request)
+    flux = request.json().get('fluxfire', 0)
+    outcome = engine.buy_credits(gs, flux)
+    if not outcome['ok']:
+        return json_response({'ok': False, 'error': outcome['error']})
+    badges = await apply_effects(request, outcome['state'], outcome['effects'],
+                                 chrono.journal_entry('buy_credits', {'fluxfire': flux}, outcome))
+    return action_response(request, gs, base, outcome, badges, ok=True)
+
+
+@route('POST', '/api/buy/range', login=True)
+async def buy_range(request):
+    data = request.json()
+    gs = game_state(request)
+    base = state_version(request)
+    credits = data.get('credits', data.get('amount', 0))
+    outcome = engine.buy_range(gs, credits)
+    if not outcome['ok']:
+        return json_response({'ok': False, 'error': outcome['error']})
+    badges = await apply_effects(request, outcome['state'], outcome['effects'],
+                                 chrono.journal_entry('buy_range', {'credits': credits}, outcome))
+    return action_response(request, gs, base, outcome, badges, ok=True)
+
+
+# --- ASGI application ---
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_stream(response, receive, send):
+    """Send a StreamingResponse body until it ends or the client disconnects, whichever comes first."""
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    chunks = response.chunks
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_chunk.done():
+                # Client went away while the stream was waiting: cancelling runs the generator's cleanup
+                next_chunk.cancel()
+                await asyncio.gather(next_chunk, return_exceptions=True)
+                return
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            if disconnected.done():
+                return
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        await chunks.aclose()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await in_storage(chrono.USER_STORE.flush)
+            STORAGE_EXECUTOR.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """The ASGI callable."""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    request = Request(scope, await _read_body(receive))
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None:
+        allowed = any(path == request.path for _, path in ROUTES)
+        response = json_response({'error': 'method not allowed' if allowed else 'not found'}, 405 if allowed else 404)
+    else:
+        try:
+            response = await handler(request)
+        except json.JSONDecodeError:
+            response = json_response({'error': 'invalid JSON body'}, 400)
+        except Exception:
+            traceback.print_exc()
+            response = json_response({'error': 'internal server error'}, 500)
+
+    headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+    streaming = isinstance(response, StreamingResponse)
+    if not streaming:
+        headers.append((b'content-length', str(len(response.body)).encode('ascii')))
+    if request.session_modified:
+        cookie = SESSIONS.set_cookie_header(request.sid, request.session)
+        headers.append((b'set-cookie', cookie.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+    if streaming:
+        await _send_stream(response, receive, send)
+    else:
+        await send({'type': 'http.response.body', 'body': response.body})
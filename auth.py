@@ -0,0 +1,125 @@
+# --- Password hashing and login rate limiting for ChronoQuest ---
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from storage import user_key
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has its maximum number of pending jobs."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a small, bounded thread pool instead of the request thread.
+
+    hashlib's scrypt and PBKDF2 release the GIL, so at most `workers` hashes burn CPU at any moment no matter
+    how many login requests arrive, and other requests keep being served. When more than `max_pending` jobs
+    are queued, new ones are refused with HasherBusy rather than piling up.
+
+    method is a werkzeug method string such as 'scrypt' or 'scrypt:16384:8:1' or 'pbkdf2:sha256:600000'.
+    """
+
+    def __init__(self, method='scrypt', workers=2, max_pending=32):
+        self.method = method
+        # The parameter part of a hash made with the current settings, e.g. 'scrypt:32768:8:1'
+        self.params = generate_password_hash('', method=method).split('$', 1)[0]
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_hash(self, password):
+        """Start hashing password; returns a concurrent.futures.Future (wrap it with asyncio.wrap_future to await)."""
+        return self._submit(generate_password_hash, password, self.method)
+
+    def submit_verify(self, password_hash, password):
+        """Start checking password against password_hash; returns a Future of the result."""
+        return self._submit(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        """Return a new hash of password (blocks the caller, not the CPU of the request thread)."""
+        return self.submit_hash(password).result()
+
+    def verify(self, password_hash, password):
+        """Return True if password matches password_hash."""
+        return self.submit_verify(password_hash, password).result()
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with a different method or cost than the current settings."""
+        return password_hash.split('$', 1)[0] != self.params
+
+    def hash_later(self, password, callback):
+        """Hash password in the background and call callback(new_hash); skipped if the pool is busy."""
+        try:
+            future = self.submit_hash(password)
+        except HasherBusy:
+            return False
+        future.add_done_callback(lambda f: f.exception() is None and callback(f.result()))
+        return True
+
+
+class RateLimiter:
+    """Token buckets keyed by e.g. username or client IP: `burst` tokens, refilled at `rate` tokens per second.
+
+    Only the most recently used `max_keys` buckets are kept; a forgotten bucket comes back full.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Take one token for key. Returns 0 if allowed, otherwise the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                wait = 0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else float('inf')
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class UsernameSet:
+    """In-memory set of taken usernames (case-folded) for answering existence checks without storage reads.
+
+    A miss is confirmed against storage before answering, so users registered by another worker process are
+    still found (and remembered from then on). Usernames are never removed.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._names = {user_key(u['playerName']) for u in store.all()}
+
+    def add(self, username):
+        self._names.add(user_key(username))
+
+    def __contains__(self, username):
+        key = user_key(username)
+        if key in self._names:
+            return True
+        if self._store.get(username) is not None:
+            self._names.add(key)
+            return True
+        return False
@@ -0,0 +1,119 @@
+# --- Badge catalog and rules for ChronoQuest ---
+import ast
+import json
+from functools import lru_cache
+from pathlib import Path
+
+BADGES_FILE = Path(__file__).with_name('badges.json')
+
+# When a badge is checked ('WinOrLoseBadge' in badges.json)
+PHASES = ('Turn', 'Win', 'Lose')
+
+# Names a badge condition can use, with the value used when a state doesn't have them (e.g. older saves)
+VARIABLES = {
+    # Game state
+    'credits': 0,
+    'energy': 0,
+    'fluxfire': 0,
+    'countShards': 0,
+    'required_flux': 0,
+    'fuel_to_make': '',
+    'currentLocation': '',
+    # Game history (engine.new_history)
+    'travels': 0,
+    'bandits': 0,
+    'paradox_escapes': 0,
+    'min_energy': 0,
+    'range_bought': 0,
+    'buy_range_uses': 0,
+    'buy_credits_uses': 0,
+    # The action being evaluated
+    'events': frozenset(),  # event types of this turn
+    'previous_action': None,  # 'travel', 'buy_range' or 'buy_credits' before this one
+    'same_destination': False,  # this travel went to the airport the player was already at
+    'quit': False,  # the game ends because the player quit
+    # The player
+    'games_played': 0,  # finished games before this one
+}
+
+# Expression syntax allowed in conditions: comparisons, and/or/not, arithmetic, `in`, names and literals
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.BinOp, ast.Add, ast.Sub,
+    ast.Mult, ast.Div, ast.Mod, ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In,
+    ast.NotIn, ast.Name, ast.Load, ast.Constant,
+)
+
+
+def compile_condition(badge_id, expression):
+    """Compile a badge condition such as "credits > 2000 and bandits == 0" into a predicate over a namespace.
+
+    Raises ValueError for syntax outside the small allowed subset or for unknown names.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as exc:
+        raise ValueError(f'{badge_id}: invalid condition {expression!r}: {exc.msg}') from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f'{badge_id}: {type(node).__name__} is not allowed in badge conditions')
+        if isinstance(node, ast.Name) and node.id not in VARIABLES and node.id not in ('True', 'False', 'None'):
+            raise ValueError(f'{badge_id}: unknown name {node.id!r} in condition {expression!r}')
+    code = compile(tree, f'<badge {badge_id}>', 'eval')
+    no_builtins = {'__builtins__': {}}
+
+    def predicate(namespace):
+        return bool(eval(code, no_builtins, namespace))
+
+    return predicate
+
+
+class BadgeCatalog:
+    """All badges from badges.json, with their conditions compiled once.
+
+    - info: badge id -> {'name', 'desc'}
+    - rules: phase -> [(badge id, predicate)] for badges that have a condition
+    Badges without a condition (null) are listed but never awarded automatically.
+    """
+
+    def __init__(self, entries):
+        self.info = {}
+        self.rules = {phase: [] for phase in PHASES}
+        self._labels = {}
+        for entry in entries:
+            badge_id = entry['BadgeID']
+            phase = entry.get('WinOrLoseBadge')
+            if phase not in PHASES:
+                raise ValueError(f'{badge_id}: WinOrLoseBadge must be one of {", ".join(PHASES)}')
+            self.info[badge_id] = {'name': entry['BadgeName'], 'desc': entry['WhatBadgeDoes']}
+            self._labels[badge_id] = f"{entry['BadgeName']} ({entry['WhatBadgeDoes']})"
+            if entry.get('Condition'):
+                self.rules[phase].append((badge_id, compile_condition(badge_id, entry['Condition'])))
+
+    @classmethod
+    def load(cls, path=BADGES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def label(self, badge_id):
+        """Return the display text for a badge ("Name (description)")."""
+        return self._labels.get(badge_id) or f'{badge_id} (Unknown Badge)'
+
+    def evaluate(self, phase, gs, **context):
+        """Return the ids of every badge of `phase` whose condition holds, checking all of them in one pass.
+
+        The namespace is the game state, its history and the given context (see VARIABLES).
+        """
+        rules = self.rules[phase]
+        if not rules:
+            return []
+        namespace = dict(VARIABLES)
+        namespace.update((name, value) for name, value in gs.items() if name in VARIABLES)
+        namespace.update(gs.get('history') or {})
+        namespace.update(context)
+        return [badge_id for badge_id, predicate in rules if predicate(namespace)]
+
+
+@lru_cache(maxsize=None)
+def default_catalog():
+    """The catalog from badges.json next to this module, loaded on first use."""
+    return BadgeCatalog.load()
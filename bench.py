@@ -0,0 +1,264 @@
+"""Benchmarks for ChronoQuest HTTP endpoints and storage helpers.
+
+For each dataset size a synthetic user database is generated, then a fresh worker process imports the app
+against it and times requests through Flask's test client plus a few hot helper functions. Results (latency
+percentiles in milliseconds and throughput) are written as JSON so runs can be compared.
+
+Usage:
+    python bench.py run --sizes 1000 10000 100000 --output bench.json
+    python bench.py run --baseline bench.json --tolerance 0.25     # exit 1 if a p50 got >25% slower
+    python bench.py generate --users 10000 --output users.json     # just write a synthetic users.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+PASSWORD = 'bench'
+DESTINATIONS = ['EGLL', 'KJFK', 'RJTT', 'OMDB', 'YSSY', 'LFPG', 'EDDF']
+
+
+# --- Synthetic data ---
+
+def synthetic_users(count, seed=1):
+    """Yield `count` user records shaped like the ones /api/user/register creates, with varied stats and saves."""
+    from werkzeug.security import generate_password_hash
+    import engine
+    from state_codec import encode_state
+
+    rng = random.Random(seed)
+    # Hashing is deliberately slow, so every synthetic user shares one hash of PASSWORD
+    password_hash = generate_password_hash(PASSWORD)
+    badge_ids = ['FIRST_WIN', 'FIRST_LOSS', 'FLUX_MASTER', 'CREDIT_KING', 'FULL_SHARDS']
+    for n in range(count):
+        name = f'bench{n:06d}'
+        wins = rng.randint(0, 20)
+        loses = rng.randint(0, 40)
+        save = None
+        if rng.random() < 0.3:
+            gs = engine.new_game_state(name, rng)
+            gs['credits'] = rng.randint(0, 3000)
+            gs['energy'] = rng.randint(0, 2000)
+            save = encode_state(gs)
+        yield {
+            'playerName': name,
+            'playerPasswordHash': password_hash,
+            'playerBadges': rng.sample(badge_ids, rng.randint(0, len(badge_ids))),
+            'playerLoseBadges': [],
+            'playerHowManyWins': wins,
+            'playerHowManyLoses': loses,
+            'playerHowManyTimesPlayed': wins + loses,
+            'jetstream_uses': 0,
+            'game_state_save': save,
+            'version': 0,
+        }
+
+
+def write_users(storage_url, count, seed=1):
+    """Fill the store at storage_url with `count` synthetic users (replacing its contents)."""
+    from storage import open_user_store
+
+    store = open_user_store(storage_url, base=Path(__file__).parent)
+    store.replace_all(list(synthetic_users(count, seed)))
+    store.flush()
+
+
+# --- Measurement ---
+
+def summarize(samples_ns):
+    """Latency percentiles (ms) and throughput for a list of per-call durations in nanoseconds."""
+    samples = sorted(samples_ns)
+    n = len(samples)
+    total = sum(samples)
+
+    def pct(p):
+        return round(samples[min(n - 1, int(p / 100 * n))] / 1e6, 4)
+
+    return {
+        'count': n,
+        'mean_ms': round(total / n / 1e6, 4),
+        'p50_ms': pct(50),
+        'p90_ms': pct(90),
+        'p99_ms': pct(99),
+        'max_ms': round(samples[-1] / 1e6, 4),
+        'ops_per_sec': round(n / (total / 1e9), 1) if total else None,
+    }
+
+
+def timed(fn, iterations):
+    """Call fn() `iterations` times and return the duration of each call in nanoseconds."""
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(iterations):
+        start = clock()
+        fn()
+        samples.append(clock() - start)
+    return samples
+
+
+def run_worker(storage_url, users, requests, micro, seed):
+    """Worker process: import the app against storage_url and benchmark endpoints and helpers."""
+    os.environ['CHRONO_STORAGE'] = storage_url
+    # Every simulated player logs in from the same address; don't let the login limiter throttle the run
+    os.environ.setdefault('CHRONO_LOGIN_LIMIT_IP', '1000000,1000000')
+    os.environ.setdefault('CHRONO_LOGIN_LIMIT_USER', '1000000,1000000')
+    import app as chrono
+    import engine
+    from state_codec import pack_state
+
+    rng = random.Random(seed)
+    client = chrono.app.test_client()
+    # The last user is the worst case for anything that still scans the user list
+    username = f'bench{users - 1:06d}'
+
+    def login():
+        res = client.post('/api/user/login', json={'name': username, 'password': PASSWORD})
+        assert res.get_json()['ok'], res.get_json()
+
+    def give_rich_state():
+        """Put a game state in the session that can travel and trade for the whole run without ending."""
+        gs = chrono.new_game_state(username)
+        gs.update(credits=10 ** 9, energy=10 ** 9, fluxfire=10 ** 6, required_flux=10 ** 7)
+        with client.session_transaction() as sess:
+            sess['game_state'] = pack_state(gs)
+
+    def request(method, path, **kwargs):
+        def call():
+            res = client.open(path, method=method, **kwargs)
+            assert res.status_code == 200, (path, res.status_code)
+        return call
+
+    def travel():
+        request('POST', '/api/main/travel', json={'ICAO': rng.choice(DESTINATIONS)})()
+
+    results = {}
+    results['login'] = summarize(timed(login, max(1, requests // 10)))
+    give_rich_state()
+    results['travel'] = summarize(timed(travel, requests))
+    give_rich_state()
+    results['buy_range'] = summarize(timed(request('POST', '/api/buy/range', json={'credits': 1}), requests))
+    results['buy_credits'] = summarize(timed(request('POST', '/api/buy/credits', json={'fluxfire': 1}), requests))
+    results['airports'] = summarize(timed(request('GET', '/api/main/airports'), requests))
+    results['badges'] = summarize(timed(request('GET', '/api/user/badges'), requests))
+
+    names = [f'bench{rng.randrange(users):06d}' for _ in range(micro)]
+    icaos = list(chrono.AIRPORTS.icao)
+    pairs = [(rng.choice(icaos), rng.choice(icaos)) for _ in range(micro)]
+    names_iter = iter(names)
+    pairs_iter = iter(pairs)
+    results['user_store_all'] = summarize(timed(chrono.USER_STORE.all, max(1, micro // 100)))
+    results['find_user'] = summarize(timed(lambda: chrono.find_user(next(names_iter)), micro))
+    chrono.get_distance_matrix()  # built or mapped once; the benchmark times lookups
+    results['airport_distance'] = summarize(timed(lambda: chrono.airport_distance(*next(pairs_iter)), micro))
+    # The sampler travel uses for its arrival events
+    results['event_sampler'] = summarize(timed(lambda: engine.EVENT_SAMPLER.sample(3), micro))
+    chrono.USER_STORE.flush()
+    return results
+
+
+# --- Reporting ---
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report, baseline, tolerance):
+    """Return lines describing every benchmark whose p50 is more than `tolerance` slower than in baseline."""
+    regressions = []
+    for size, benches in report['results'].items():
+        for name, stats in benches.items():
+            old = baseline.get('results', {}).get(size, {}).get(name)
+            if old and old['p50_ms'] and stats['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{size} users / {name}: p50 {old['p50_ms']} ms -> {stats['p50_ms']} ms")
+    return regressions
+
+
+def cmd_generate(args):
+    path = Path(args.output).resolve()
+    write_users('json:///' + str(path), args.users, args.seed)
+    print(f'wrote {args.users} users to {path}')
+    return 0
+
+
+def cmd_run(args):
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'storage': args.storage,
+            'requests': args.requests,
+            'micro': args.micro,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    workdir = Path(tempfile.mkdtemp(prefix='chronoquest-bench-'))
+    for size in args.sizes:
+        if args.storage == 'sqlite':
+            storage_url = 'sqlite:///' + str(workdir / f'users-{size}.db')
+        else:
+            storage_url = 'json:///' + str(workdir / f'users-{size}.json')
+        print(f'{size} users: generating', file=sys.stderr)
+        write_users(storage_url, size, args.seed)
+        print(f'{size} users: benchmarking', file=sys.stderr)
+        # A fresh process per size, so every run starts from a cold import against its own dataset
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            report['results'][str(size)] = pool.submit(
+                run_worker, storage_url, size, args.requests, args.micro, args.seed).result()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ChronoQuest endpoints and helpers.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks')
+    run.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='user counts to test')
+    run.add_argument('--requests', type=int, default=100, help='requests per endpoint (login uses a tenth)')
+    run.add_argument('--micro', type=int, default=10000, help='calls per helper microbenchmark')
+    run.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--output', help='write the JSON report to this file')
+    run.add_argument('--baseline', help='earlier JSON report to compare against')
+    run.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown vs baseline (default: 0.25)')
+    run.set_defaults(func=cmd_run)
+
+    generate = commands.add_parser('generate', help='write a synthetic users.json')
+    generate.add_argument('--users', type=int, default=1000)
+    generate.add_argument('--seed', type=int, default=1)
+    generate.add_argument('--output', default='users.json')
+    generate.set_defaults(func=cmd_generate)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
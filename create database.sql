@@ -26,7 +26,10 @@ CREATE TABLE IF NOT EXISTS users (
     jetstream_uses INT DEFAULT 0,
 
     -- CRITICAL FIX: Stores the full, resumable game state
-    game_state_save LONGTEXT NULL 
+    game_state_save LONGTEXT NULL,
+
+    -- Bumped on every change to the row (optimistic concurrency control)
+    record_version INT DEFAULT 0
 );
 
 -- 3. Create the 'airports' table
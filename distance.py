@@ -0,0 +1,68 @@
+# --- Vectorized great-circle distances for ChronoQuest ---
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+R = 6371  # Earth radius in kilometers
+
+# Rows of the all-pairs matrix computed per block when building it (bounds temporary memory use)
+MATRIX_BLOCK_ROWS = 1024
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Return Haversine distances (km) between points given in degrees. Arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distances_from(lat, lon, lats, lons):
+    """Return distances (km, float) from one point to every point in lats/lons, in one batch."""
+    return haversine_km(lat, lon, lats, lons)
+
+
+def dataset_hash(icaos, lats, lons):
+    """Return a short hash identifying an airport dataset (codes and coordinates, in order)."""
+    h = hashlib.sha256()
+    h.update('\n'.join(icaos).encode('utf-8'))
+    h.update(np.ascontiguousarray(lats, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(lons, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def build_distance_matrix(lats, lons, out=None):
+    """Compute the all-pairs distance matrix (km, float32), block by block.
+
+    If out is given (e.g. a memory-mapped array) the result is written into it.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n = len(lats)
+    if out is None:
+        out = np.empty((n, n), dtype=np.float32)
+    for start in range(0, n, MATRIX_BLOCK_ROWS):
+        stop = min(start + MATRIX_BLOCK_ROWS, n)
+        out[start:stop] = haversine_km(lats[start:stop, None], lons[start:stop, None], lats[None, :], lons[None, :])
+    return out
+
+
+def load_distance_matrix(icaos, lats, lons, cache_dir):
+    """Return the all-pairs distance matrix for a dataset, memory-mapped from cache_dir.
+
+    The cache file is keyed by the dataset hash, so editing the airport data simply produces a new file.
+    Workers that open the same file share its pages through the OS page cache.
+    """
+    cache_dir = Path(cache_dir)
+    path = cache_dir / f'distances-{dataset_hash(icaos, lats, lons)}.npy'
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Build into a temp file and rename, so concurrent workers never map a half-written matrix
+        tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp.npy')
+        matrix = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(len(lats), len(lats)))
+        build_distance_matrix(lats, lons, out=matrix)
+        matrix.flush()
+        del matrix
+        os.replace(tmp, path)
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,349 @@
+# --- ChronoQuest game rules (no Flask, no I/O) ---
+import random
+import time
+
+from badges import default_catalog
+from sampling import WeightedSampler
+
+HOME = 'EFHK'  # Helsinki-Vantaa Airport: start and finish
+NUM_SHARDS = 5
+
+# Fuel type -> [min, max] Fluxfire required to make it
+FUEL_TYPES = {"Aetherite": [8, 12], "Lumorin": [14, 18], "Voltash": [5, 8], "Noxalite": [11, 15], "Inferno": [1, 5]}
+
+MIN_TRAVEL_COST = 20
+MAX_TRAVEL_COST = 200
+
+# Exchange rates
+CREDITS_PER_FLUX = 10
+ENERGY_PER_CREDIT = 1
+
+# Normal event pool when not trapped; the sampler is built once and reused for every travel
+EVENT_POPULATION = ['bandit', 'credits', 'range', 'fluxfire', 'paradox', 'shard', 'nothing']
+EVENT_WEIGHTS = [1, 1, 1, 1, 1, 1, 1]  # equal chance for each event
+EVENT_SAMPLER = WeightedSampler(EVENT_POPULATION, EVENT_WEIGHTS)
+
+PARADOX_COINS_TO_ESCAPE = 3
+# Seconds a player may stay trapped in a paradox before losing (enforced by the client on the timer's last tick)
+PARADOX_TIME_LIMIT = 120
+
+
+def new_game_state(username, rng=random, fuel_types=FUEL_TYPES):
+    """Create and return a fresh game state for a given username.
+
+    Randomly selects a fuel type and required flux to vary each new game.
+    """
+    chosen_fuel = rng.choice(list(fuel_types.keys()))
+    required_flux = rng.randint(fuel_types[chosen_fuel][0], fuel_types[chosen_fuel][1])
+
+    return {
+        'playerName': username,
+        'credits': 1000,
+        'energy': 1000,
+        'shards': {},
+        'countShards': 0,
+        'currentLocation': HOME,
+        'fluxfire': 0,
+        'paradox': {'active': False, 'coins': 0, 'startTime': 0},
+        'fuel_to_make': chosen_fuel,
+        'required_flux': required_flux,
+        'history': new_history()
+    }
+
+
+def new_history():
+    """Per-game counters that badge conditions can refer to (see badges.VARIABLES)."""
+    return {
+        'travels': 0,
+        'bandits': 0,
+        'paradox_escapes': 0,
+        'min_energy': 1000,
+        'range_bought': 0,
+        'buy_range_uses': 0,
+        'buy_credits_uses': 0,
+        'last_action': None,
+    }
+
+
+def copy_state(gs):
+    """Return a copy of a game state that shares no mutable parts with the original."""
+    history = gs.get('history')
+    return {**gs, 'shards': dict(gs['shards']), 'paradox': dict(gs['paradox']),
+            'history': dict(history) if history else new_history()}
+
+
+def _history(gs):
+    """Return the state's history, adding one to states that predate it."""
+    history = gs.get('history')
+    if not history:
+        history = gs['history'] = new_history()
+    return history
+
+
+def check_loss_conditions(gs):
+    """Return True when the game's special loss conditions are met.
+
+    Loss occurs when:
+      - credits <= 20 and energy == 0
+      OR
+      - credits == 0 and 10 <= energy <= 20
+    """
+    credits = gs.get('credits', 0)
+    energy = gs.get('energy', 0)
+    if credits <= 20 and energy == 0:
+        return True
+    if credits == 0 and 10 <= energy <= 20:
+        return True
+    return False
+
+
+def random_travel_cost(from_icao, to_icao, rng=random):
+    """Default travel cost: uniformly random between MIN_TRAVEL_COST and MAX_TRAVEL_COST."""
+    return rng.randint(MIN_TRAVEL_COST, MAX_TRAVEL_COST)
+
+
+def result(gs, events=(), win=False, lose=False, effects=(), ok=True, error=None):
+    """Build the outcome of an action.
+
+    effects tell the caller what to do outside the rules:
+      - {'type': 'badge', 'badge': id}   award a badge
+      - {'type': 'finish', 'win': bool}  record the game result (stats, clears the saved game)
+      - {'type': 'save'}                 store the new state (session and saved game)
+    Badge effects always come together with a finish or save effect, so they can be written with it.
+    """
+    out = {'state': gs, 'events': list(events), 'win': win, 'lose': lose, 'effects': list(effects), 'ok': ok}
+    if error:
+        out['error'] = error
+    return out
+
+
+def _badge_effects(badge_ids):
+    return [{'type': 'badge', 'badge': badge_id} for badge_id in badge_ids]
+
+
+def travel(gs, icao, rng=random, cost_fn=random_travel_cost, sampler=EVENT_SAMPLER, clock=time.time, in_place=False,
+           catalog=None, player=None):
+    """Apply one travel to icao: energy cost, arrival events, paradox trap, shards, win/lose checks and badges.
+
+    Returns a result() dict. The input state is left untouched unless in_place is True (useful for fast
+    simulations). rng must offer randint/random/choice (random.Random or the random module); cost_fn is
+    called as cost_fn(from_icao, to_icao, rng); clock returns the current time in seconds. Badges come from
+    catalog (default: badges.json); player holds facts about the player for badge conditions, e.g.
+    {'games_played': 3}.
+    """
+    if not in_place:
+        gs = copy_state(gs)
+    catalog = catalog or default_catalog()
+    player = player or {}
+    history = _history(gs)
+    previous_action = history['last_action']
+    events = []
+
+    # Prevent travel if the player has no energy (cannot move)
+    if gs['energy'] <= 0:
+        return result(gs, [{'type': 'no_energy', 'message': 'Cannot travel with 0 Energy. Must refuel.'}],
+                      ok=False, error='Insufficient Energy')
+
+    # Check for EFHK (home) win condition: all shards and enough fluxfire
+    if icao == HOME:
+        if gs['countShards'] == NUM_SHARDS and gs['fluxfire'] >= gs['required_flux']:
+            history['travels'] += 1
+            history['last_action'] = 'travel'
+            events.append({'type': 'win', 'fuel': gs['fuel_to_make'], 'required_flux': gs['required_flux']})
+            badges = catalog.evaluate('Win', gs, events=frozenset(('win',)), previous_action=previous_action,
+                                      same_destination=icao == gs['currentLocation'], **player)
+            return result(gs, events, win=True, effects=_badge_effects(badges) + [{'type': 'finish', 'win': True}])
+        events.append({'type': 'efhk_requirements_not_met', 'required_flux': gs['required_flux']})
+        return result(gs, events, effects=[{'type': 'save'}])
+
+    # --- Standard travel logic (applies whether or not trapped in a paradox) ---
+    cost = cost_fn(gs['currentLocation'], icao, rng)
+
+    # Deduct energy cost; if not enough, deplete energy to 0 and notify
+    if gs['energy'] < cost:
+        gs['energy'] = 0
+        events.append({'type': 'insufficient_range', 'message': 'Not enough range for full travel; range set to 0.'})
+    else:
+        gs['energy'] -= cost
+
+    same_destination = icao == gs['currentLocation']
+    gs['currentLocation'] = icao
+    history['travels'] += 1
+    history['last_action'] = 'travel'
+
+    # --- Random events on arrival ---
+    paradox = gs['paradox']
+    num_events = rng.randint(1, 3)
+
+    if paradox['active']:
+        # When trapped in a paradox, either nothing happens or a paradox coin is awarded (50/50)
+        if rng.random() < 0.5:
+            paradox['coins'] += 1
+            events.append({'type': 'paradox_coin', 'coins': paradox['coins']})
+
+            if paradox['coins'] >= PARADOX_COINS_TO_ESCAPE:
+                paradox['active'] = False
+                paradox['coins'] = 0
+                history['paradox_escapes'] += 1
+                events.append({'type': 'paradox_escaped'})
+        else:
+            events.append({'type': 'nothing'})
+    else:
+        for ev in sampler.sample(num_events, rng):
+            _apply_event(gs, ev, events, rng, clock)
+
+    # Update the shard count based on collected shards
+    gs['countShards'] = sum(1 for v in gs['shards'].values() if v)
+    history['min_energy'] = min(history['min_energy'], gs['energy'])
+    history['bandits'] += sum(1 for e in events if e['type'] == 'bandit')
+
+    # All badges for this turn (and for the loss, if any) are checked in one pass over the final state
+    context = dict(player, events=frozenset(e['type'] for e in events), previous_action=previous_action,
+                   same_destination=same_destination)
+    badges = catalog.evaluate('Turn', gs, **context)
+
+    if check_loss_conditions(gs):
+        events.append({'type': 'lose', 'message': 'You have lost the game.'})
+        badges += catalog.evaluate('Lose', gs, **context)
+        effects = _badge_effects(badges) + [{'type': 'finish', 'win': False}, {'type': 'save'}]
+        return result(gs, events, lose=True, effects=effects)
+
+    return result(gs, events, effects=_badge_effects(badges) + [{'type': 'save'}])
+
+
+def quit_game(gs, catalog=None, player=None):
+    """End the game because the player quit: checks the 'Lose' badges with quit=True and saves the state."""
+    history = gs.get('history') or {}
+    badges = (catalog or default_catalog()).evaluate('Lose', gs, quit=True, previous_action=history.get('last_action'),
+                                                     **(player or {}))
+    return result(gs, effects=_badge_effects(badges) + [{'type': 'save'}])
+
+
+def _apply_event(gs, ev, events, rng, clock):
+    """Apply one arrival event from the normal pool to gs (in place)."""
+    if ev == 'bandit':
+        # Bandit steals either credits or range (randomly chosen)
+        steal_type = rng.choice(['credits', 'range'])
+        if steal_type == 'credits':
+            loss_amount = rng.randint(20, 100)
+            gs['credits'] = max(0, gs['credits'] - loss_amount)
+            events.append({'type': 'bandit', 'subtype': 'credits', 'amount': loss_amount})
+        else:
+            loss_amount = rng.randint(10, 100)
+            gs['energy'] = max(0, gs['energy'] - loss_amount)
+            events.append({'type': 'bandit', 'subtype': 'range', 'amount': loss_amount})
+
+    elif ev == 'credits':
+        # Player gains credits
+        gain = rng.randint(10, 100)
+        gs['credits'] += gain
+        events.append({'type': 'credits', 'amount': gain})
+
+    elif ev == 'range':
+        # Player gains energy (range)
+        gain = rng.randint(10, 100)
+        gs['energy'] += gain
+        events.append({'type': 'range', 'amount': gain})
+
+    elif ev == 'fluxfire':
+        # Increment fluxfire
+        gs['fluxfire'] += 1
+        events.append({'type': 'fluxfire'})
+
+    elif ev == 'paradox':
+        # Activate paradox trap if not already active
+        if not gs['paradox'].get('active', False):
+            gs['paradox'] = {'active': True, 'coins': 0, 'startTime': int(clock() * 1000)}
+            events.append({'type': 'paradox'})
+        else:
+            events.append({'type': 'nothing'})
+
+    elif ev == 'shard':
+        # Give the next uncollected shard (1..5) if available
+        shard_id = next((i for i in range(1, NUM_SHARDS + 1) if str(i) not in gs['shards']), None)
+        if shard_id is not None:
+            gs['shards'][str(shard_id)] = True
+            events.append({'type': 'shard', 'shard': shard_id})
+        else:
+            events.append({'type': 'nothing'})
+
+    elif ev == 'nothing':
+        events.append({'type': 'nothing'})
+
+
+def buy_credits(gs, flux_spend, in_place=False):
+    """Exchange fluxfire for credits at a fixed rate (1 Fluxfire = 10 Credits). Returns a result() dict."""
+    if not flux_spend or flux_spend <= 0:
+        return result(gs, ok=False, error='Invalid amount of Fluxfire.')
+    if gs['fluxfire'] < flux_spend:
+        return result(gs, ok=False, error='Not enough Fluxfire.')
+
+    if not in_place:
+        gs = copy_state(gs)
+    gs['fluxfire'] -= flux_spend
+    gs['credits'] += flux_spend * CREDITS_PER_FLUX
+    history = _history(gs)
+    history['buy_credits_uses'] += 1
+    history['last_action'] = 'buy_credits'
+    return result(gs, effects=[{'type': 'save'}])
+
+
+def buy_range(gs, credits_spend, in_place=False):
+    """Exchange credits for energy (range) at 1 Credit = 1 Energy. Returns a result() dict."""
+    if not credits_spend or credits_spend <= 0:
+        return result(gs, ok=False, error='Invalid amount of Credits.')
+    if gs['credits'] < credits_spend:
+        return result(gs, ok=False, error='Not enough Credits.')
+
+    if not in_place:
+        gs = copy_state(gs)
+    gs['credits'] -= credits_spend
+    gs['energy'] += credits_spend * ENERGY_PER_CREDIT
+    history = _history(gs)
+    history['buy_range_uses'] += 1
+    history['range_bought'] += credits_spend
+    history['last_action'] = 'buy_range'
+    return result(gs, effects=[{'type': 'save'}])
+
+
+def apply_actions(gs, actions, rng=random, cost_fn=random_travel_cost, sampler=EVENT_SAMPLER, clock=time.time,
+                  catalog=None, player=None):
+    """Apply a batch of actions in order, all or nothing.
+
+    actions is a list of dicts: {'type': 'travel', 'ICAO': ...}, {'type': 'buy_range', 'credits': ...} or
+    {'type': 'buy_credits', 'fluxfire': ...}. If any action fails, the result is not ok, the input state is
+    returned unchanged and 'failed' holds the index of the failing action. A game that ends (win or loss)
+    ends the batch; the actions after it are not applied.
+
+    Returns a result() dict for the whole batch: the final state, every event, the combined effects (so the
+    caller saves once), 'results' with the type, events, win and lose of each applied action, and 'applied'.
+    """
+    work = copy_state(gs)
+    events, effects, results = [], [], []
+    outcome = None
+    for index, action in enumerate(actions):
+        kind = action.get('type')
+        if kind == 'travel':
+            outcome = travel(work, action.get('ICAO'), rng, cost_fn, sampler, clock, in_place=True, catalog=catalog,
+                             player=player)
+        elif kind == 'buy_range':
+            outcome = buy_range(work, action.get('credits', action.get('amount', 0)), in_place=True)
+        elif kind == 'buy_credits':
+            outcome = buy_credits(work, action.get('fluxfire', 0), in_place=True)
+        else:
+            outcome = result(work, ok=False, error=f'Unknown action type: {kind!r}')
+        if not outcome['ok']:
+            failed = result(gs, outcome['events'], ok=False, error=f"Action {index + 1} ({kind}): {outcome['error']}")
+            failed['failed'] = index
+            return failed
+        events.extend(outcome['events'])
+        effects.extend(outcome['effects'])
+        results.append({'type': kind, 'events': outcome['events'], 'win': outcome['win'], 'lose': outcome['lose']})
+        if outcome['win'] or outcome['lose']:
+            break
+
+    batch = result(work, events, win=bool(outcome and outcome['win']), lose=bool(outcome and outcome['lose']),
+                   effects=effects)
+    batch['results'] = results
+    batch['applied'] = len(results)
+    return batch
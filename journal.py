@@ -0,0 +1,237 @@
+# --- Append-only game journals for ChronoQuest ---
+import json
+import os
+import random
+import re
+import secrets
+import time
+import zlib
+from pathlib import Path
+
+import engine
+from storage import locked_file
+
+GAME_ID = re.compile(r'^(\d{8})-[0-9a-f]{16}$')
+# Turn records between two snapshots of a game
+SNAPSHOT_EVERY = 50
+# Bytes read per step when looking for a journal's last record
+TAIL_BLOCK = 4096
+
+
+class JournalError(Exception):
+    """A journal is missing, damaged or doesn't replay to the states it recorded."""
+
+
+class Turn:
+    """The randomness and time of one turn.
+
+    The engine draws from random.Random(seed) and reads a clock frozen at `time`, so a journal that records
+    both can replay the turn exactly.
+    """
+
+    def __init__(self, seed=None, now=None):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.time = time.time() if now is None else now
+        self.rng = random.Random(self.seed)
+
+    def clock(self):
+        return self.time
+
+
+def state_checksum(gs):
+    """CRC-32 of a game state's canonical JSON; stored with each turn so replays can be verified."""
+    return zlib.crc32(json.dumps(gs, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+
+def read_journal(path):
+    """Yield the records of one journal file in order.
+
+    A last line without its newline is a write cut short by a crash and is skipped.
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            yield json.loads(line)
+
+
+def read_last_record(f):
+    """Return (offset just after the last complete record, that record) of a journal open for reading in
+    binary mode, reading backwards from its end; (0, None) for a journal without a complete record."""
+    pos = f.seek(0, os.SEEK_END)
+    data = b''
+    while pos > 0 and data.count(b'\n') < 2:
+        step = min(TAIL_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        data = f.read(step) + data
+    end = data.rfind(b'\n')
+    if end < 0:
+        return 0, None
+    start = data.rfind(b'\n', 0, end) + 1
+    return pos + end + 1, json.loads(data[start:end])
+
+
+def apply_turn(gs, record, cost_fn=engine.random_travel_cost, catalog=None):
+    """Re-run one recorded turn on gs and return the new state."""
+    kind = record['type']
+    args = record.get('args') or {}
+    if kind in ('travel', 'actions'):
+        turn = Turn(record['seed'], record['t'])
+        if kind == 'travel':
+            outcome = engine.travel(gs, args.get('ICAO'), turn.rng, cost_fn, clock=turn.clock, catalog=catalog)
+        else:
+            outcome = engine.apply_actions(gs, args.get('actions', []), turn.rng, cost_fn, clock=turn.clock,
+                                           catalog=catalog)
+    elif kind == 'buy_range':
+        outcome = engine.buy_range(gs, args.get('credits', 0))
+    elif kind == 'buy_credits':
+        outcome = engine.buy_credits(gs, args.get('fluxfire', 0))
+    else:
+        # quit and other markers don't change the state
+        return gs
+    if not outcome['ok']:
+        raise JournalError(f"Turn {record['seq']} ({kind}) failed on replay: {outcome.get('error')}")
+    return outcome['state']
+
+
+class GameJournal:
+    """One append-only JSON Lines file per game: a start record with the initial state, then one record per turn
+    (action, arguments, RNG seed, time, events, badges earned, result and a checksum of the resulting state).
+
+    Each turn is a single sequential append instead of a rewrite of the saved game. Every snapshot_every turns
+    the state is also written to a small snapshot file along with the journal offset it corresponds to, so a
+    replay starts there and only re-runs the turns after it. The journal itself is never rewritten and stays a
+    complete audit trail of the game.
+
+    Files live in directory/<YYYYMMDD>/<game id>.jsonl, grouped by the day the game started. Turns are numbered
+    by the journal itself, under an exclusive lock on <game id>.lock, so requests racing on the same game (or a
+    replayed old session) can't write duplicate or out-of-order turn numbers. Such a turn may also have started
+    from another state than the journal's last one; it is then recorded with its resulting state, which replays
+    take as-is instead of re-running the turn.
+    """
+
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY, fsync=False):
+        self.directory = Path(directory)
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+
+    def path(self, game_id):
+        match = GAME_ID.match(game_id or '')
+        if match is None:
+            raise JournalError(f'Invalid game id: {game_id!r}')
+        return self.directory / match.group(1) / f'{game_id}.jsonl'
+
+    def snapshot_path(self, game_id):
+        return self.path(game_id).with_suffix('.snap')
+
+    def lock_path(self, game_id):
+        return self.path(game_id).with_suffix('.lock')
+
+    def start(self, username, gs, now=None):
+        """Open the journal of a new game and return its id."""
+        now = time.time() if now is None else now
+        game_id = f"{time.strftime('%Y%m%d', time.gmtime(now))}-{secrets.token_hex(8)}"
+        path = self.path(game_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._append(path, {'seq': 0, 't': now, 'type': 'start', 'player': username, 'state': gs})
+        return game_id
+
+    def append(self, game_id, record, gs):
+        """Append a turn record that left the game in state gs and return its turn number ('seq', counting
+        from 1: one more than the journal's last record). Snapshots gs when one is due.
+
+        record['base'], when given, is the state_checksum of the state the turn was applied to.
+        """
+        path = self.path(game_id)
+        with locked_file(self.lock_path(game_id)):
+            try:
+                f = open(path, 'r+b')
+            except FileNotFoundError:
+                raise JournalError(f'No journal for game {game_id}') from None
+            with f:
+                end, last = read_last_record(f)
+                if last is None:
+                    raise JournalError(f'Journal of game {game_id} has no start record')
+                # Anything after the last complete record is a write cut short by a crash
+                f.truncate(end)
+                seq = last['seq'] + 1
+                record = {'seq': seq, **record, 'crc': state_checksum(gs)}
+                last_crc = last['crc'] if 'crc' in last else state_checksum(last['state'])
+                if record.get('base', last_crc) != last_crc:
+                    # Not a continuation of the last recorded state (e.g. a stale session)
+                    record['state'] = gs
+                offset = self._write(f, record)
+            if self.snapshot_every and seq % self.snapshot_every == 0:
+                self._write_snapshot(game_id, seq, offset, gs)
+        return seq
+
+    def _append(self, path, record):
+        """Write one record with a single append; returns the journal offset just after it."""
+        with open(path, 'ab') as f:
+            return self._write(f, record)
+
+    def _write(self, f, record):
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        f.seek(0, os.SEEK_END)
+        f.write(line)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        return f.tell()
+
+    def _write_snapshot(self, game_id, seq, offset, gs):
+        path = self.snapshot_path(game_id)
+        tmp = path.with_suffix('.snap.tmp')
+        tmp.write_text(json.dumps({'seq': seq, 'offset': offset, 'state': gs}, separators=(',', ':')),
+                       encoding='utf-8')
+        os.replace(tmp, path)
+
+    def _snapshot(self, game_id, upto):
+        try:
+            snapshot = json.loads(self.snapshot_path(game_id).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        return snapshot if upto is None or snapshot['seq'] <= upto else None
+
+    def records(self, game_id):
+        """Yield every record of a game's journal, starting with the start record."""
+        path = self.path(game_id)
+        if not path.exists():
+            raise JournalError(f'No journal for game {game_id}')
+        yield from read_journal(path)
+
+    def replay(self, game_id, upto=None, cost_fn=engine.random_travel_cost, catalog=None, verify=True):
+        """Rebuild the state of a game after turn upto (default: its last turn).
+
+        Starts from the latest snapshot at or before upto and re-runs the turns after it with their recorded
+        seeds and times (turns recorded with their state take that state). cost_fn must price travel the way
+        the server did (e.g. app.travel_cost with CHRONO_TRAVEL_COST=distance). With verify, every replayed
+        state is checked against the recorded checksum.
+        """
+        path = self.path(game_id)
+        snapshot = self._snapshot(game_id, upto)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            raise JournalError(f'No journal for game {game_id}') from None
+        with f:
+            if snapshot is not None:
+                gs, seq = snapshot['state'], snapshot['seq']
+                f.seek(snapshot['offset'])
+            else:
+                start = json.loads(f.readline())
+                gs, seq = start['state'], 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                if upto is not None and record['seq'] > upto:
+                    break
+                if record['seq'] != seq + 1:
+                    raise JournalError(f"Game {game_id}: expected turn {seq + 1}, found {record['seq']}")
+                gs = record['state'] if 'state' in record else apply_turn(gs, record, cost_fn, catalog)
+                seq = record['seq']
+                if verify and 'crc' in record and state_checksum(gs) != record['crc']:
+                    raise JournalError(f'Game {game_id} diverged from its journal at turn {seq}')
+        return gs
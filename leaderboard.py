@@ -0,0 +1,261 @@
+# --- Leaderboards for ChronoQuest ---
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+
+from storage import user_key
+
+# Rankings: most wins, best win rate (players with at least min_games finished games), most badges
+BOARDS = ('wins', 'win_rate', 'badges')
+
+
+class SortedIndex:
+    """Sorted multiset kept as a list of small sorted buckets (each at most 2 * load items).
+
+    Finding an item is a binary search over the bucket maxima and then inside one bucket (O(log n)); adding or
+    removing one only shifts items within that bucket, so updates stay cheap with hundreds of thousands of
+    entries. A Fenwick tree over the bucket sizes counts the items before a bucket in O(log n), so rank() never
+    walks the buckets. Iteration yields the items in order.
+    """
+
+    def __init__(self, items=(), load=256):
+        self._load = load
+        items = sorted(items)
+        self._buckets = [items[i:i + load] for i in range(0, len(items), load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(items)
+        self._reindex()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def _reindex(self):
+        """Rebuild the Fenwick tree over bucket sizes (after a bucket is split or dropped)."""
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _resize(self, i, delta):
+        """Record that bucket i grew (or shrank) by delta items."""
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_before(self, i):
+        """Number of items in the buckets before bucket i."""
+        count = 0
+        while i:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def add(self, item):
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            self._reindex()
+        else:
+            i = min(bisect_left(self._maxes, item), len(self._buckets) - 1)
+            bucket = self._buckets[i]
+            insort(bucket, item)
+            self._maxes[i] = bucket[-1]
+            if len(bucket) > 2 * self._load:
+                # Split an overgrown bucket in two
+                self._buckets.insert(i + 1, bucket[self._load:])
+                del bucket[self._load:]
+                self._maxes.insert(i, bucket[-1])
+                self._reindex()
+            else:
+                self._resize(i, 1)
+        self._len += 1
+
+    def remove(self, item):
+        """Remove one occurrence of item; returns False if it isn't present."""
+        i = bisect_left(self._maxes, item)
+        if i == len(self._buckets):
+            return False
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, item)
+        if j == len(bucket) or bucket[j] != item:
+            return False
+        del bucket[j]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._resize(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._reindex()
+        self._len -= 1
+        return True
+
+    def head(self, n):
+        """The first n items."""
+        return list(islice(self, n))
+
+    def rank(self, item):
+        """Number of items that sort before item (its 0-based position if present)."""
+        i = bisect_left(self._maxes, item)
+        before = self._count_before(i)
+        if i < len(self._buckets):
+            before += bisect_left(self._buckets[i], item)
+        return before
+
+
+def player_stats(user):
+    """The public stats of a user record."""
+    played = user.get('playerHowManyTimesPlayed', 0)
+    wins = user.get('playerHowManyWins', 0)
+    return {
+        'playerName': user['playerName'],
+        'wins': wins,
+        'losses': user.get('playerHowManyLoses', 0),
+        'played': played,
+        'winRate': round(wins / played, 4) if played else 0.0,
+        'badges': len(user.get('playerBadges') or []),
+    }
+
+
+class Leaderboard:
+    """Top players by wins, win rate and badges, from per-board sorted indexes over every user.
+
+    The indexes are built from the store on first use. After that update(user) moves one player in each
+    board (a binary search and a bucket shift per board) whenever their stats change, so nothing is rescanned
+    or re-sorted per request. top() answers come from a cache that lives cache_ttl seconds.
+
+    The indexes live in one process. When refresh_interval is set, they are rebuilt from the store that often,
+    so changes made by other worker processes show up too. Only the first build happens inside a request: later
+    rebuilds read the store on a background thread while requests keep using the current indexes, and the new
+    indexes are swapped in (with any update() calls made meanwhile replayed on top) once they are ready.
+    """
+
+    def __init__(self, store, min_games=5, cache_ttl=5.0, refresh_interval=None, clock=time.monotonic):
+        self._store = store
+        self.min_games = min_games
+        self.cache_ttl = cache_ttl
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._indexes = None  # board -> SortedIndex of sort keys
+        self._keys = {}  # user key -> {board: sort key}
+        self._stats = {}  # user key -> player_stats()
+        self._built = 0
+        self._refreshing = None  # user key -> latest record passed to update() while a rebuild runs
+        self._cache = {}  # (board, limit) -> (expires, players)
+        self._lock = threading.Lock()
+
+    def _sort_keys(self, key, stats):
+        """The sort key of a player on each board they qualify for (best first)."""
+        keys = {}
+        if stats['wins']:
+            keys['wins'] = (-stats['wins'], stats['played'], key)
+        if stats['played'] >= self.min_games:
+            keys['win_rate'] = (-stats['wins'] / stats['played'], -stats['wins'], key)
+        if stats['badges']:
+            keys['badges'] = (-stats['badges'], -stats['wins'], key)
+        return keys
+
+    def _build(self):
+        """Read every user from the store into new (indexes, keys, stats); leaves the current ones untouched."""
+        columns = {board: [] for board in BOARDS}
+        keys_by_user = {}
+        stats_by_user = {}
+        for user in self._store.all():
+            key = user_key(user['playerName'])
+            stats = player_stats(user)
+            keys = self._sort_keys(key, stats)
+            stats_by_user[key] = stats
+            keys_by_user[key] = keys
+            for board, sort_key in keys.items():
+                columns[board].append(sort_key)
+        indexes = {board: SortedIndex(items) for board, items in columns.items()}
+        return indexes, keys_by_user, stats_by_user
+
+    def _install(self, built):
+        """Switch to freshly built indexes (caller holds the lock)."""
+        self._indexes, self._keys, self._stats = built
+        self._built = self._clock()
+        self._cache.clear()
+
+    def _ensure_built(self):
+        """Build the indexes on first use and start a background rebuild when they are due (caller holds the lock)."""
+        if self._indexes is None:
+            self._install(self._build())
+        elif (self.refresh_interval is not None and self._refreshing is None
+              and self._clock() - self._built >= self.refresh_interval):
+            self._refreshing = {}
+            threading.Thread(target=self._refresh, name='leaderboard-refresh', daemon=True).start()
+
+    def _refresh(self):
+        """Background rebuild: scan the store without holding the lock, then swap the result in."""
+        built = None
+        try:
+            built = self._build()
+        finally:
+            with self._lock:
+                updated, self._refreshing = self._refreshing, None
+                if built is not None:
+                    self._install(built)
+                    # The scan may have read these records before their latest change
+                    for user in updated.values():
+                        self._move(user)
+
+    def _move(self, user):
+        """Re-rank one player in every board (caller holds the lock)."""
+        key = user_key(user['playerName'])
+        stats = player_stats(user)
+        old = self._keys.get(key, {})
+        new = self._sort_keys(key, stats)
+        for board in BOARDS:
+            if old.get(board) != new.get(board):
+                if board in old:
+                    self._indexes[board].remove(old[board])
+                if board in new:
+                    self._indexes[board].add(new[board])
+        self._keys[key] = new
+        self._stats[key] = stats
+
+    def update(self, user):
+        """Re-rank one player after their record changed (e.g. after update_user_stats)."""
+        if user is None:
+            return
+        with self._lock:
+            if self._indexes is None:
+                # Not built yet; the first top() reads the latest records anyway
+                return
+            self._move(user)
+            if self._refreshing is not None:
+                self._refreshing[user_key(user['playerName'])] = user
+
+    def top(self, board, limit=10):
+        """The first `limit` players of a board, each with their rank and stats."""
+        if board not in BOARDS:
+            raise ValueError(f'Unknown leaderboard: {board}')
+        with self._lock:
+            now = self._clock()
+            cached = self._cache.get((board, limit))
+            if cached is not None and cached[0] > now:
+                return cached[1]
+            self._ensure_built()
+            players = [{'rank': rank, **self._stats[sort_key[-1]]}
+                       for rank, sort_key in enumerate(self._indexes[board].head(limit), 1)]
+            self._cache[(board, limit)] = (now + self.cache_ttl, players)
+            return players
+
+    def rank(self, board, username):
+        """A player's 1-based rank on a board, or None when they don't qualify for it."""
+        with self._lock:
+            self._ensure_built()
+            sort_key = self._keys.get(user_key(username), {}).get(board)
+            if sort_key is None:
+                return None
+            return self._indexes[board].rank(sort_key) + 1
@@ -0,0 +1,190 @@
+"""HTTP load test for a running ChronoQuest server (the Flask app or the ASGI variant).
+
+Simulates many concurrent players over real sockets: each registers, then keeps traveling and buying range
+for the given duration while holding its connection open between requests when the server allows it.
+Prints (or writes) latency percentiles, throughput and error counts as JSON.
+
+Registration and login come from a single IP, so raise the server's login limits for the test run.
+
+Usage:
+    export CHRONO_LOGIN_LIMIT_IP=1000000,1000000 CHRONO_LOGIN_LIMIT_USER=1000000,1000000
+    python app.py                                      # or: uvicorn asgi:application --port 5000
+    python loadtest.py --url http://127.0.0.1:5000 --players 200 --duration 30 --output flask.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+DESTINATIONS = ['EGLL', 'KJFK', 'RJTT', 'OMDB', 'YSSY', 'LFPG', 'EDDF']
+
+
+class Client:
+    """Minimal HTTP/1.1 JSON client on asyncio streams, with a cookie jar and reconnects."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+    async def request(self, method, path, payload=None):
+        """Send one request and return (status, parsed JSON body or None)."""
+        return await asyncio.wait_for(self._request(method, path, payload), self.timeout)
+
+    async def _request(self, method, path, payload):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        headers = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}',
+                   'Accept: application/json']
+        if payload is not None:
+            headers.append('Content-Type: application/json')
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        self._writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        length = None
+        keep_alive = version == 'HTTP/1.1'
+        while True:
+            line = (await self._reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection':
+                keep_alive = value.lower() == 'keep-alive' or (keep_alive and value.lower() != 'close')
+            elif name == 'set-cookie':
+                for key, morsel in SimpleCookie(value).items():
+                    if morsel.value:
+                        self.cookies[key] = morsel.value
+                    else:
+                        self.cookies.pop(key, None)
+        data = await self._reader.readexactly(length) if length is not None else await self._reader.read()
+        if length is None or not keep_alive:
+            await self.close()
+        try:
+            return int(status), json.loads(data) if data else None
+        except ValueError:
+            return int(status), None
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    def record(self, name, seconds, status):
+        self.latencies.setdefault(name, []).append(seconds)
+        self.statuses[str(status)] += 1
+
+    def report(self, elapsed):
+        out = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            n = len(samples)
+
+            def pct(p):
+                return round(samples[min(n - 1, int(p / 100 * n))] * 1000, 2)
+
+            out[name] = {'count': n, 'per_sec': round(n / elapsed, 1), 'p50_ms': pct(50), 'p90_ms': pct(90),
+                         'p99_ms': pct(99), 'max_ms': round(samples[-1] * 1000, 2)}
+        total = sum(len(s) for s in self.latencies.values())
+        return {'requests': total, 'requests_per_sec': round(total / elapsed, 1), 'endpoints': out,
+                'statuses': dict(self.statuses), 'errors': dict(self.errors)}
+
+
+async def player(n, args, stats, deadline):
+    """One virtual player: register, then travel and refuel until the deadline."""
+    url = urlsplit(args.url)
+    client = Client(url.hostname, url.port or 80, args.timeout)
+    rng = random.Random(f'{args.seed}:{n}')
+    name = f'load{os.getpid()}-{n}'
+
+    async def call(label, method, path, payload=None):
+        start = time.perf_counter()
+        try:
+            status, data = await client.request(method, path, payload)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+            stats.errors[type(exc).__name__] += 1
+            await client.close()
+            return None, None
+        stats.record(label, time.perf_counter() - start, status)
+        return status, data
+
+    # Spread the arrivals over the ramp-up period
+    await asyncio.sleep(rng.random() * args.ramp_up)
+    try:
+        status, _ = await call('register', 'POST', '/api/user/register', {'name': name, 'password': 'load'})
+        if status != 200:
+            return
+        while time.perf_counter() < deadline:
+            status, data = await call('travel', 'POST', '/api/main/travel', {'ICAO': rng.choice(DESTINATIONS)})
+            if data is None:
+                continue
+            state = data.get('state') or {}
+            credits = state.get('credits', 0)
+            if data.get('win') or data.get('lose') or (status == 400 and not credits):
+                # Game over (or stranded without credits): log in again for a fresh game
+                await call('login', 'POST', '/api/user/login', {'name': name, 'password': 'load'})
+            elif credits and (status == 400 or state.get('energy', 0) < 100):
+                await call('buy_range', 'POST', '/api/buy/range', {'credits': min(credits, 200)})
+            if args.think_time:
+                await asyncio.sleep(rng.random() * 2 * args.think_time)
+    finally:
+        await client.close()
+
+
+async def run(args):
+    stats = Stats()
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    await asyncio.gather(*(player(n, args, stats, deadline) for n in range(args.players)))
+    return stats.report(time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test a running ChronoQuest server.')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--players', type=int, default=100, help='concurrent virtual players (default: 100)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of play after ramp-up (default: 30)')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds over which players arrive (default: 5)')
+    parser.add_argument('--think-time', type=float, default=0, help='mean pause between actions in seconds')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    report['settings'] = {k: v for k, v in vars(args).items() if k != 'output'}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# --- Metrics and profiling for ChronoQuest ---
+import cProfile
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+from flask.sessions import SessionInterface
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Upper bounds of the per-request file read/write count buckets
+IO_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            labels = _labels(self.label_names, values)
+            yield f'{self.name}{{{labels}}} {total}' if labels else f'{self.name} {total}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered like a Prometheus histogram."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((values, list(series)) for values, series in self._series.items())
+        for values, series in items:
+            labels = _labels(self.label_names, values)
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-2]}'
+            suffix = f'{{{labels}}}' if labels else ''
+            yield f'{self.name}_count{suffix} {series[-2]}'
+            yield f'{self.name}_sum{suffix} {series[-1]:.6f}'
+
+
+class Registry:
+    """Holds the metrics exposed on /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+SPAN_SECONDS = REGISTRY.histogram('chronoquest_span_seconds', 'Time spent in instrumented operations.', ('span',))
+REQUEST_SECONDS = REGISTRY.histogram('chronoquest_request_seconds', 'HTTP request latency.', ('endpoint',))
+REQUESTS = REGISTRY.counter('chronoquest_requests_total', 'HTTP requests by endpoint and status.',
+                            ('endpoint', 'status'))
+FILE_READS = REGISTRY.histogram('chronoquest_request_file_reads', 'User file reads per request.', ('endpoint',),
+                                IO_BUCKETS)
+FILE_WRITES = REGISTRY.histogram('chronoquest_request_file_writes', 'User file writes per request.', ('endpoint',),
+                                 IO_BUCKETS)
+PROFILES = REGISTRY.counter('chronoquest_profiles_written_total', 'Request profiles written to disk.')
+
+
+# --- Spans ---
+
+@contextmanager
+def span(name):
+    """Time the enclosed block into chronoquest_span_seconds{span=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times response serialization (everything jsonify does)."""
+
+    def response(self, *args, **kwargs):
+        with span('jsonify'):
+            return super().response(*args, **kwargs)
+
+
+class TimedSessionInterface(SessionInterface):
+    """Wraps another session interface and times session loading and saving (the (de)serialization step)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def open_session(self, app, request):
+        with span('session_open'):
+            return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with span('session_save'):
+            return self.inner.save_session(app, session, response)
+
+    def make_null_session(self, app):
+        return self.inner.make_null_session(app)
+
+    def is_null_session(self, obj):
+        return self.inner.is_null_session(obj)
+
+
+# --- Per-request instrumentation ---
+
+class RequestProfiler:
+    """Profiles a random sample of requests with cProfile and writes one .prof file per profiled request.
+
+    Only one profiler can run at a time, so a sampled request is skipped while another one is being profiled.
+    """
+
+    def __init__(self, directory, rate):
+        self.directory = Path(directory)
+        self.rate = rate
+        self._busy = threading.Lock()
+
+    def start(self):
+        """Return a running profiler for this request, or None when it isn't sampled."""
+        if self.rate <= 0 or random.random() >= self.rate or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profiler, endpoint):
+        profiler.disable()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = f'{time.strftime("%Y%m%d-%H%M%S")}-{endpoint}-{threading.get_ident()}-{time.perf_counter_ns()}.prof'
+            profiler.dump_stats(self.directory / name)
+            PROFILES.inc()
+        finally:
+            self._busy.release()
+
+
+def instrument(app, store, profiler=None):
+    """Record per-request latency, status and user-file I/O counts (and optional profiles) for app.
+
+    store is the UserStore; its reads and writes are timed as the users_read and users_write spans and, when it
+    counts file I/O (store.io), the reads and writes made by the request's own thread are recorded per endpoint.
+    """
+    app.json = TimedJSONProvider(app)
+    app.session_interface = TimedSessionInterface(app.session_interface)
+    store.span = span
+    io = getattr(store, 'io', None)
+
+    @app.before_request
+    def start_request():
+        g.metrics_start = time.perf_counter()
+        if io is not None:
+            g.metrics_io = io.thread_counts()
+        g.metrics_profile = profiler.start() if profiler is not None else None
+
+    @app.after_request
+    def finish_request(response):
+        endpoint = request.endpoint or 'unknown'
+        if 'metrics_start' in g:
+            REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, endpoint)
+        REQUESTS.inc(endpoint, str(response.status_code))
+        if io is not None and 'metrics_io' in g:
+            reads, writes = io.thread_counts()
+            FILE_READS.observe(reads - g.metrics_io[0], endpoint)
+            FILE_WRITES.observe(writes - g.metrics_io[1], endpoint)
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        # Runs even when the view raised, so the profiler is always released
+        if g.get('metrics_profile') is not None:
+            profiler.finish(g.pop('metrics_profile'), request.endpoint or 'unknown')
@@ -0,0 +1,207 @@
+# --- Route planner for ChronoQuest ---
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Airports considered per plan: the ones nearest to the start (plus home). Bounds the work per plan whatever the
+# size of the dataset.
+CANDIDATES = 150
+# Plans are memoized per (location, energy // ENERGY_BUCKET) and computed for the bucket's lowest energy, so a
+# cached plan is affordable for every energy in its bucket
+ENERGY_BUCKET = 20
+# Tie-breaker per km between hops of equal energy cost; small enough that it can never outweigh one energy point
+KM_WEIGHT = 1e-9
+
+
+def nearest_neighbour(cost, weight, energy, start=0, home=1):
+    """Greedy tour: keep flying to the cheapest unvisited airport from which home is still affordable, then go home.
+
+    cost and weight are square matrices over the candidate airports (energy per hop, and energy plus a small
+    distance tie-breaker). Returns the route as candidate indices, from start to home.
+    """
+    n = len(cost)
+    visited = np.zeros(n, dtype=bool)
+    visited[[start, home]] = True
+    route = [start]
+    used = 0
+    current = start
+    while True:
+        # Candidates that still leave enough energy to get home afterwards
+        ok = ~visited & (used + cost[current] + cost[:, home] <= energy)
+        if not ok.any():
+            break
+        step = int(np.argmin(np.where(ok, weight[current], np.inf)))
+        used += int(cost[current, step])
+        visited[step] = True
+        route.append(step)
+        current = step
+    route.append(home)
+    return route
+
+
+def two_opt(route, weight, deadline, clock=time.perf_counter):
+    """Shorten a route with fixed endpoints by reversing segments while that lowers its weight.
+
+    Returns False if the deadline passed before no improving move was left.
+    """
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(route) - 2):
+            if clock() > deadline:
+                return False
+            a, b = route[i - 1], route[i]
+            # All segment ends j at once: gain of replacing (a, b) + (c, d) with (a, c) + (b, d)
+            c = np.asarray(route[i + 1:-1])
+            d = np.asarray(route[i + 2:])
+            delta = weight[a, c] + weight[b, d] - weight[a, b] - weight[c, d]
+            j = int(np.argmin(delta))
+            if delta[j] < -KM_WEIGHT:
+                route[i:i + j + 2] = route[i:i + j + 2][::-1]
+                improved = True
+    return True
+
+
+def insert_stops(route, cost, weight, energy):
+    """Add unvisited airports where they cost the least extra energy, while the route stays affordable.
+
+    Returns the number of stops added.
+    """
+    added = 0
+    used = route_cost(route, cost)
+    visited = np.zeros(len(cost), dtype=bool)
+    visited[route] = True
+    while True:
+        unvisited = np.flatnonzero(~visited)
+        if not len(unvisited):
+            return added
+        a = np.asarray(route[:-1])[:, None]
+        b = np.asarray(route[1:])[:, None]
+        extra = weight[a, unvisited] + weight[unvisited, b] - weight[a, b]
+        extra_cost = cost[a, unvisited] + cost[unvisited, b] - cost[a, b]
+        extra = np.where(used + extra_cost <= energy, extra, np.inf)
+        edge, pick = np.unravel_index(int(np.argmin(extra)), extra.shape)
+        if not np.isfinite(extra[edge, pick]):
+            return added
+        route.insert(edge + 1, int(unvisited[pick]))
+        used += int(extra_cost[edge, pick])
+        visited[unvisited[pick]] = True
+        added += 1
+
+
+def route_cost(route, cost):
+    return int(sum(cost[a, b] for a, b in zip(route, route[1:])))
+
+
+class RoutePlanner:
+    """Energy-bounded shard-hunting tours: as many distinct stops as the player's energy allows, ending at home.
+
+    Every arrival rolls the arrival events (shards, fluxfire, credits, ...), so a good tour is one with many cheap
+    hops. A plan considers the CANDIDATES airports nearest to the start. It builds a nearest-neighbour tour,
+    then alternates 2-opt (to free energy) with cheapest insertion (to spend it on more stops) until neither
+    helps.
+
+    Each plan has a time budget. When 2-opt or insertion runs out of time, the best tour so far is returned. When
+    there isn't even time to build the nearest-neighbour tour, the plan is a direct flight home. Plans that
+    finished within budget are memoized per (location, energy bucket) in an LRU cache of cache_size entries.
+
+    nearest(i, k) returns the ids of the k airports nearest to airport i, distances(ids) their pairwise distance
+    matrix in km (e.g. a slice of the cached all-pairs matrix) and hop_cost(km) the energy of flights of those
+    distances.
+    """
+
+    def __init__(self, icaos, positions, nearest, distances, hop_cost, home='EFHK', budget=0.05, cache_size=4096,
+                 candidates=CANDIDATES, clock=time.perf_counter):
+        self.icaos = icaos
+        self.positions = positions
+        self.home = home
+        self.budget = budget
+        self.candidates = candidates
+        self._nearest = nearest
+        self._distances = distances
+        self._hop_cost = hop_cost
+        self._clock = clock
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def plan(self, origin, energy):
+        """Plan a tour from origin with the given energy. Returns a dict (see _solve), or None for unknown airports."""
+        if origin not in self.positions or self.home not in self.positions:
+            return None
+        bucket = max(0, int(energy)) // ENERGY_BUCKET
+        key = (origin, bucket)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return self._report(cached, energy, True)
+        started = self._clock()
+        plan = self._solve(origin, bucket * ENERGY_BUCKET, started + self.budget)
+        plan['elapsed_ms'] = round((self._clock() - started) * 1000, 2)
+        # Plans cut short by the budget aren't remembered, so a quieter moment can find a better one
+        if plan['complete']:
+            with self._lock:
+                self._cache[key] = plan
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return self._report(plan, energy, False)
+
+    def _solve(self, origin, energy, deadline):
+        start, home = self.positions[origin], self.positions[self.home]
+        ids = [start, home] if start != home else [start]
+        ids += [i for i in self._nearest(start, self.candidates) if i != start and i != home]
+        ids = np.asarray(ids)
+        km = np.asarray(self._distances(ids), dtype=np.float64)
+        cost = np.asarray(self._hop_cost(km), dtype=np.int64)
+        np.fill_diagonal(cost, 0)  # staying put is free (e.g. a tour that starts at home)
+        home_local = 1 if start != home else 0
+        weight = cost + km * KM_WEIGHT
+
+        if cost[0, home_local] > energy:
+            # Not even the flight home is affordable
+            return self._result(ids, [0], cost, energy, 'none', True)
+        if self._clock() > deadline:
+            return self._result(ids, [0, home_local], cost, energy, 'direct', False)
+
+        route = nearest_neighbour(cost, weight, energy, 0, home_local)
+        if start == home and len(route) == 2:
+            route = [0]  # nowhere affordable to go and already home
+        method, complete = 'nearest-neighbour', True
+        while len(route) > 2:
+            if not two_opt(route, weight, deadline, self._clock):
+                complete = False
+                break
+            method = '2-opt'
+            if self._clock() > deadline:
+                complete = False
+                break
+            if not insert_stops(route, cost, weight, energy):
+                break
+        return self._result(ids, route, cost, energy, method, complete)
+
+    def _result(self, ids, route, cost, energy, method, complete):
+        """The plan for a route; energy (the bucket floor it was solved for) only bounds it, see _report."""
+        stops = [{'ICAO': self.icaos[int(ids[b])], 'cost': int(cost[a, b])} for a, b in zip(route, route[1:])]
+        return {
+            'origin': self.icaos[int(ids[route[0]])],
+            'home': self.home,
+            'feasible': method != 'none',
+            'stops': stops,
+            'energy_used': sum(stop['cost'] for stop in stops),
+            'method': method,
+            'complete': complete,
+        }
+
+    @staticmethod
+    def _report(plan, energy, cached):
+        """A plan as answered to a player with `energy`: the energy left after each stop counts from their real
+        energy, not from the bucket floor the plan was solved (and cached) for."""
+        left = energy
+        stops = []
+        for stop in plan['stops']:
+            left -= stop['cost']
+            stops.append({**stop, 'energy_left': left})
+        return {**plan, 'energy': energy, 'stops': stops, 'cached': cached}
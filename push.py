@@ -0,0 +1,195 @@
+# --- Server-push event streams for ChronoQuest ---
+import asyncio
+import json
+import queue
+import secrets
+import threading
+import time
+
+from engine import PARADOX_TIME_LIMIT
+from state_codec import client_state, state_patch
+from storage import user_key
+
+# Seconds between keep-alive comments on an idle stream (also how fast a closed connection is noticed)
+HEARTBEAT_INTERVAL = 15
+# Seconds between paradox timer ticks while the player is trapped
+TICK_INTERVAL = 1
+# Messages buffered per stream; a stream that falls this far behind is closed and the browser reconnects
+MAX_QUEUE = 256
+
+
+def format_event(kind, data):
+    """One Server-Sent Events message."""
+    return f'event: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscription:
+    """One open stream of one player. Messages are (kind, data, state) tuples; state is the full game state
+    after the message (or None) so the stream can follow the paradox timer without re-reading the session.
+
+    Created with an event loop, it can be awaited with next(); otherwise get() blocks the calling thread.
+    """
+
+    def __init__(self, username, loop=None):
+        self.id = secrets.token_urlsafe(12)
+        self.username = username
+        self.closed = False
+        self._loop = loop
+        self._queue = asyncio.Queue(MAX_QUEUE) if loop is not None else queue.Queue(MAX_QUEUE)
+
+    def put(self, message):
+        """Queue a message (from any thread). A stream that can't keep up is closed."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._put, message)
+        else:
+            self._put(message)
+
+    def _put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except (queue.Full, asyncio.QueueFull):
+            self.closed = True
+
+    def get(self, timeout):
+        """Wait up to timeout seconds for the next message; None when there is none."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def next(self, timeout):
+        """Async form of get()."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PushHub:
+    """Open streams by player, for publishing game updates to every tab a player has open.
+
+    The hub lives in one process: with several worker processes a player's stream and actions can land on
+    different workers, in which case actions simply get full responses (see is_streaming).
+    """
+
+    def __init__(self):
+        self._streams = {}  # username key -> {stream id: Subscription}
+        self._lock = threading.Lock()
+
+    def subscribe(self, username, loop=None):
+        subscription = Subscription(username, loop)
+        with self._lock:
+            self._streams.setdefault(user_key(username), {})[subscription.id] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        key = user_key(subscription.username)
+        with self._lock:
+            streams = self._streams.get(key, {})
+            streams.pop(subscription.id, None)
+            if not streams:
+                self._streams.pop(key, None)
+
+    def is_streaming(self, username, stream_id):
+        """True when stream_id is an open stream of username in this process."""
+        if not stream_id or not username:
+            return False
+        with self._lock:
+            return stream_id in self._streams.get(user_key(username), {})
+
+    def publish(self, username, kind, data, state=None):
+        """Send a message to every open stream of username."""
+        with self._lock:
+            streams = list(self._streams.get(user_key(username), {}).values())
+        for subscription in streams:
+            subscription.put((kind, data, state))
+
+    def publish_state(self, username, gs, version):
+        """Send a full state snapshot (e.g. a new game) to every open stream of username."""
+        self.publish(username, 'state', {'version': version, 'state': client_state(gs)}, gs)
+
+    def publish_outcome(self, username, before, after, base, version, events=(), badges=(), finish=None):
+        """Publish what a game action changed: its events, the state delta, new badges and the game result.
+
+        The delta is a JSON Patch from the state at version base to the state at version (see
+        app.save_game_state; None when the new state wasn't saved).
+        """
+        if not self.is_active(username):
+            return
+        if events:
+            self.publish(username, 'events', list(events))
+        patch = state_patch(client_state(before) or {}, client_state(after))
+        if patch:
+            self.publish(username, 'delta', {'base': base, 'version': version, 'patch': patch}, after)
+        if badges:
+            self.publish(username, 'badges', list(badges))
+        if finish is not None:
+            self.publish(username, 'finish', finish)
+
+    def is_active(self, username):
+        with self._lock:
+            return user_key(username) in self._streams
+
+    def stream_count(self):
+        with self._lock:
+            return sum(len(streams) for streams in self._streams.values())
+
+
+class PlayerStream:
+    """The text side of one stream, shared by the Flask and ASGI servers.
+
+    opening() is sent first (the stream id and a full, versioned state snapshot), then handle() for each published
+    message and idle() whenever wait_time() passes without one: a paradox timer tick while the player is
+    trapped, otherwise a keep-alive comment.
+    """
+
+    def __init__(self, subscription, gs, version, clock=time.time):
+        self.subscription = subscription
+        self.state = gs or {}
+        self.version = version
+        self.clock = clock
+        self._last_sent = clock()
+
+    def opening(self):
+        yield 'retry: 3000\n\n'
+        yield format_event('hello', {'stream': self.subscription.id})
+        yield format_event('state', {'version': self.version, 'state': client_state(self.state)})
+        yield from self._paradox_tick()
+        self._last_sent = self.clock()
+
+    def wait_time(self):
+        if self._paradox_active():
+            return TICK_INTERVAL
+        return max(0.0, HEARTBEAT_INTERVAL - (self.clock() - self._last_sent))
+
+    def handle(self, message):
+        kind, data, state = message
+        if state is not None:
+            self.state = state
+        self._last_sent = self.clock()
+        yield format_event(kind, data)
+        if kind in ('delta', 'state'):
+            yield from self._paradox_tick()
+
+    def idle(self):
+        self._last_sent = self.clock()
+        if self._paradox_active():
+            yield from self._paradox_tick()
+        else:
+            yield ': keep-alive\n\n'
+
+    def _paradox_active(self):
+        return bool((self.state.get('paradox') or {}).get('active'))
+
+    def _paradox_tick(self):
+        paradox = self.state.get('paradox') or {}
+        if not paradox.get('active'):
+            return
+        elapsed = self.clock() - paradox.get('startTime', 0) / 1000
+        remaining = max(0, PARADOX_TIME_LIMIT - int(elapsed))
+        if remaining == 0:
+            # Tick the expiry once; the client ends the game
+            self.state = {**self.state, 'paradox': {**paradox, 'active': False}}
+        yield format_event('paradox', {'coins': paradox.get('coins', 0), 'remaining': remaining,
+                                       'expired': remaining == 0})
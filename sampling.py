@@ -0,0 +1,78 @@
+# --- Weighted event sampling for ChronoQuest ---
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+import numpy as np
+
+
+class WeightedSampler:
+    """Weighted sampling without replacement from a fixed pool, set up once and reused across requests.
+
+    Draws follow the same process as drawing one item proportionally to its weight, removing it and repeating,
+    but without copying the pool on every call:
+    a draw bisects the precomputed cumulative weights and simply redraws if it lands on an item that was
+    already picked, which is equivalent to drawing from the remaining items.
+    """
+
+    def __init__(self, population, weights):
+        if len(population) != len(weights):
+            raise ValueError('population and weights must have the same length')
+        if any(w < 0 for w in weights):
+            raise ValueError('weights must be non-negative')
+        self.population = tuple(population)
+        self.weights = tuple(float(w) for w in weights)
+        self.total = sum(self.weights)
+        self._cumulative = list(accumulate(self.weights))
+        # Batched mode: log-weights for Gumbel-top-k sampling (zero weights can never be picked)
+        with np.errstate(divide='ignore'):
+            self._log_weights = np.log(np.asarray(self.weights, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.population)
+
+    def sample(self, k, rng=random):
+        """Return up to k distinct items, drawn by weight without replacement, using rng (a random.Random)."""
+        k = min(k, len(self.population))
+        cumulative = self._cumulative
+        total = self.total
+        picked = []
+        picked_weight = 0.0
+        while len(picked) < k:
+            remaining = total - picked_weight
+            if remaining <= total * 1e-12:
+                break
+            if remaining < total / 2:
+                # Most of the weight is already taken; draw directly among the rest instead of rejecting a lot
+                i = self._draw_from_rest(picked, rng)
+            else:
+                i = bisect_right(cumulative, rng.random() * total)
+                if i >= len(cumulative) or i in picked:
+                    continue
+            picked.append(i)
+            picked_weight += self.weights[i]
+        return [self.population[i] for i in picked]
+
+    def _draw_from_rest(self, picked, rng):
+        """Draw one index proportionally to weight among the indexes not yet picked."""
+        rest = [i for i in range(len(self.weights)) if i not in picked and self.weights[i] > 0]
+        r = rng.random() * sum(self.weights[i] for i in rest)
+        for i in rest:
+            r -= self.weights[i]
+            if r < 0:
+                return i
+        return rest[-1]
+
+    def sample_batch(self, k, size, rng=None):
+        """Draw `size` independent samples of up to k distinct items at once (for simulations).
+
+        Uses the Gumbel-top-k trick, which has the same distribution as successive weighted draws without
+        replacement. Returns an int array of shape (size, k) holding population indexes, in draw order;
+        slots that can't be filled (fewer than k items with positive weight) are -1.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        k = min(k, len(self.population))
+        keys = self._log_weights + rng.gumbel(size=(size, len(self.population)))
+        top = np.argsort(-keys, axis=1)[:, :k]
+        top[~np.isfinite(np.take_along_axis(keys, top, axis=1))] = -1
+        return top
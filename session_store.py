@@ -0,0 +1,182 @@
+# --- Server-side sessions for ChronoQuest ---
+import atexit
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class LRUSessionCache:
+    """In-process LRU of session dicts with an idle TTL and an optional durable spill tier.
+
+    Sessions evicted for capacity are written to the spill store (if any) and read back on the next access;
+    sessions idle for longer than ttl seconds are dropped. Counters in stats() help size capacity and ttl.
+    """
+
+    def __init__(self, capacity=10000, ttl=86400, spill=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.spill = spill
+        self._entries = OrderedDict()  # sid -> (expires_at, data)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'spill_hits': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, sid):
+        """Return the session data for sid (refreshing its TTL), or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > now:
+                    self._entries[sid] = (now + self.ttl, data)
+                    self._entries.move_to_end(sid)
+                    self._stats['hits'] += 1
+                    return data
+                del self._entries[sid]
+                self._stats['expirations'] += 1
+        data = self.spill.pop(sid, now) if self.spill is not None else None
+        with self._lock:
+            if data is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['spill_hits'] += 1
+        self.set(sid, data)
+        return data
+
+    def set(self, sid, data):
+        """Store session data for sid, evicting the least recently used sessions beyond capacity."""
+        evicted = []
+        with self._lock:
+            self._entries[sid] = (time.time() + self.ttl, data)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.capacity:
+                evicted.append(self._entries.popitem(last=False))
+                self._stats['evictions'] += 1
+        if self.spill is not None and evicted:
+            self.spill.put_many((sid, expires_at, data) for sid, (expires_at, data) in evicted)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+        if self.spill is not None:
+            self.spill.pop(sid, time.time())
+
+    def spill_all(self):
+        """Move every cached session to the spill store (called at shutdown)."""
+        if self.spill is None:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        self.spill.put_many((sid, expires_at, data) for sid, (expires_at, data) in entries)
+
+    def stats(self):
+        """Return cache counters plus current size and capacity."""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), capacity=self.capacity, ttl=self.ttl)
+        if self.spill is not None:
+            stats['spilled'] = self.spill.count()
+        return stats
+
+
+class SqliteSessionSpill:
+    """Durable tier for sessions evicted from the in-process cache, stored in a SQLite file."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, expires REAL, data TEXT)')
+
+    def put_many(self, rows):
+        rows = [(sid, expires_at, session_json_serializer.dumps(data)) for sid, expires_at, data in rows]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO sessions (sid, expires, data) VALUES (?, ?, ?)', rows)
+            self._conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+
+    def pop(self, sid, now):
+        """Remove and return the session data for sid if present and not expired."""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT expires, data FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+        expires_at, data = row
+        return session_json_serializer.loads(data) if expires_at > now else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict identified by a random id; the data itself stays on the server."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface keeping session data in an LRUSessionCache; the cookie only carries a signed id.
+
+    The cache lives in the worker process, so run a single (threaded) process or use sticky sessions when
+    running several workers with this interface.
+    """
+
+    salt = 'chronoquest-session'
+
+    def __init__(self, cache):
+        self.cache = cache
+        atexit.register(cache.spill_all)
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.cache.get(sid)
+                if data is not None:
+                    # Work on a copy so a failed request doesn't leave half-applied changes in the cache
+                    return ServerSideSession(dict(data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.cache.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.cache.set(session.sid, dict(session))
+        if self.should_set_cookie(app, session) or session.new:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode('ascii'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
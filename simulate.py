@@ -0,0 +1,233 @@
+"""Monte Carlo balance simulator for ChronoQuest.
+
+Plays many games straight through the game engine (no Flask, no storage) on a pool of worker processes and
+reports win rate, average turns, how games were lost and how often each badge was earned. Use it to see the
+effect of tuning the fuel ranges, the travel cost range or the event weights before changing the game.
+
+Games are split into fixed-size chunks and every chunk gets its own seeded RNG, so the same --seed gives the
+same results whatever the number of processes.
+
+Strategies:
+    greedy     hunt shards and only buy range when out of energy
+    threshold  buy range whenever energy drops below --refuel-below
+
+Usage:
+    python simulate.py --games 100000 --processes 8
+    python simulate.py --strategy threshold --refuel-below 150 --refuel-amount 300 --output games.csv
+    python simulate.py --cost-range 20 150 --weights bandit=2,shard=0.5 --fuel-types '{"Inferno": [1, 5]}'
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import engine
+from sampling import WeightedSampler
+
+DESTINATIONS = ['EGLL', 'KJFK', 'RJTT', 'OMDB', 'YSSY', 'LFPG', 'EDDF']
+CHUNK_SIZE = 1000
+FIELDS = ['game', 'strategy', 'fuel', 'required_flux', 'result', 'loss_reason', 'turns', 'credits', 'energy',
+          'fluxfire', 'shards', 'badges']
+
+
+def _clock():
+    """Simulated games don't need wall-clock paradox timestamps."""
+    return 0.0
+
+
+def loss_reason(gs):
+    """Name the loss condition that ended a game."""
+    if gs['credits'] <= 20 and gs['energy'] == 0:
+        return 'stranded'  # credits <= 20 and no energy
+    return 'broke'  # no credits and 10-20 energy
+
+
+def refuel(gs, amount):
+    """Buy up to `amount` range, first turning surplus fluxfire into credits if credits fall short."""
+    surplus = gs['fluxfire'] - gs['required_flux']
+    if gs['credits'] < amount and surplus > 0:
+        engine.buy_credits(gs, min(surplus, -(-(amount - gs['credits']) // engine.CREDITS_PER_FLUX)), in_place=True)
+    engine.buy_range(gs, min(gs['credits'], amount), in_place=True)
+
+
+def play_game(settings, rng, sampler, cost_fn):
+    """Play one game with the configured strategy. Returns a result row (see FIELDS)."""
+    gs = engine.new_game_state('sim', rng, settings['fuel_types'])
+    badges = set()
+    result = 'unfinished'
+    turns = 0
+    while turns < settings['max_turns']:
+        if settings['strategy'] == 'threshold':
+            if gs['energy'] < settings['refuel_below']:
+                refuel(gs, settings['refuel_amount'])
+        elif gs['energy'] <= 0:
+            refuel(gs, settings['refuel_amount'])
+
+        ready = gs['countShards'] == engine.NUM_SHARDS and gs['fluxfire'] >= gs['required_flux']
+        destination = engine.HOME if ready else rng.choice(DESTINATIONS)
+        outcome = engine.travel(gs, destination, rng, cost_fn=cost_fn, sampler=sampler, clock=_clock, in_place=True)
+        if not outcome['ok']:
+            # No energy and nothing left to buy it with, yet not a loss by the game's rules
+            result = 'stuck'
+            break
+        turns += 1
+        badges.update(e['badge'] for e in outcome['effects'] if e['type'] == 'badge')
+        if outcome['win']:
+            result = 'win'
+            break
+        if outcome['lose']:
+            result = 'lose'
+            break
+
+    return {
+        'strategy': settings['strategy'],
+        'fuel': gs['fuel_to_make'],
+        'required_flux': gs['required_flux'],
+        'result': result,
+        'loss_reason': loss_reason(gs) if result == 'lose' else '',
+        'turns': turns,
+        'credits': gs['credits'],
+        'energy': gs['energy'],
+        'fluxfire': gs['fluxfire'],
+        'shards': gs['countShards'],
+        'badges': ';'.join(sorted(badges)),
+    }
+
+
+def run_chunk(settings, chunk, count):
+    """Worker: play `count` games for chunk number `chunk` with the chunk's own seeded RNG. Returns result rows."""
+    rng = random.Random(f"{settings['seed']}:{chunk}")
+    sampler = WeightedSampler(engine.EVENT_POPULATION, settings['weights'])
+    low, high = settings['cost_range']
+
+    def cost_fn(from_icao, to_icao, rng):
+        return rng.randint(low, high)
+
+    rows = []
+    first = chunk * CHUNK_SIZE
+    for n in range(count):
+        row = play_game(settings, rng, sampler, cost_fn)
+        row['game'] = first + n
+        rows.append(row)
+    return rows
+
+
+class Summary:
+    """Running totals over result rows, so the rows themselves never need to be kept."""
+
+    def __init__(self):
+        self.games = 0
+        self.results = Counter()
+        self.loss_reasons = Counter()
+        self.badges = Counter()
+        self.turns = 0
+        self.win_turns = 0
+
+    def add(self, row):
+        self.games += 1
+        self.results[row['result']] += 1
+        self.turns += row['turns']
+        if row['result'] == 'win':
+            self.win_turns += row['turns']
+        elif row['result'] == 'lose':
+            self.loss_reasons[row['loss_reason']] += 1
+        for badge in filter(None, row['badges'].split(';')):
+            self.badges[badge] += 1
+
+    def report(self):
+        games = self.games or 1
+        wins = self.results['win']
+        return {
+            'games': self.games,
+            'win_rate': round(wins / games, 4),
+            'results': dict(self.results),
+            'avg_turns': round(self.turns / games, 2),
+            'avg_turns_to_win': round(self.win_turns / wins, 2) if wins else None,
+            'loss_reasons': dict(self.loss_reasons),
+            'badge_frequency': {badge: round(n / games, 4) for badge, n in sorted(self.badges.items())},
+        }
+
+
+def open_writer(path):
+    """Return (write_row, close) for a .csv or .jsonl output file."""
+    f = open(path, 'w', newline='', encoding='utf-8')
+    if str(path).endswith('.jsonl'):
+        return (lambda row: f.write(json.dumps(row) + '\n')), f.close
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    return writer.writerow, f.close
+
+
+def parse_weights(text):
+    """'bandit=2,shard=0.5' -> event weights in EVENT_POPULATION order (unlisted events keep their default)."""
+    weights = dict(zip(engine.EVENT_POPULATION, engine.EVENT_WEIGHTS))
+    for item in filter(None, text.split(',')):
+        name, _, value = item.partition('=')
+        if name not in weights:
+            raise argparse.ArgumentTypeError(f'unknown event {name!r} (choose from {", ".join(weights)})')
+        weights[name] = float(value)
+    return [weights[name] for name in engine.EVENT_POPULATION]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate ChronoQuest games to check game balance.')
+    parser.add_argument('--games', type=int, default=10000, help='games to play (default: 10000)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--strategy', choices=['greedy', 'threshold'], default='greedy')
+    parser.add_argument('--refuel-below', type=int, default=200, help='threshold strategy: refuel under this energy')
+    parser.add_argument('--refuel-amount', type=int, default=200, help='credits spent per refuel (default: 200)')
+    parser.add_argument('--max-turns', type=int, default=500, help='give up on a game after this many travels')
+    parser.add_argument('--cost-range', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                        default=[engine.MIN_TRAVEL_COST, engine.MAX_TRAVEL_COST], help='random travel cost range')
+    parser.add_argument('--weights', type=parse_weights, default=list(engine.EVENT_WEIGHTS),
+                        help='event weights, e.g. bandit=2,shard=0.5')
+    parser.add_argument('--fuel-types', type=json.loads, default=engine.FUEL_TYPES,
+                        help='fuel type ranges as JSON, e.g. \'{"Inferno": [1, 5]}\'')
+    parser.add_argument('--output', help='write one row per game to this .csv or .jsonl file')
+    args = parser.parse_args(argv)
+    if args.games < 1:
+        parser.error('--games must be at least 1')
+
+    settings = {
+        'seed': args.seed,
+        'strategy': args.strategy,
+        'refuel_below': args.refuel_below,
+        'refuel_amount': args.refuel_amount,
+        'max_turns': args.max_turns,
+        'cost_range': args.cost_range,
+        'weights': args.weights,
+        'fuel_types': args.fuel_types,
+    }
+    chunks = [(n, min(CHUNK_SIZE, args.games - n * CHUNK_SIZE)) for n in range(-(-args.games // CHUNK_SIZE))]
+
+    summary = Summary()
+    write_row, close = open_writer(args.output) if args.output else (None, None)
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            # Chunks come back in order, so the output file is the same for a given seed
+            for rows in pool.map(run_chunk, [settings] * len(chunks), *zip(*chunks)):
+                for row in rows:
+                    summary.add(row)
+                    if write_row:
+                        write_row(row)
+    finally:
+        if close:
+            close()
+
+    report = summary.report()
+    report['seconds'] = round(time.perf_counter() - started, 2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
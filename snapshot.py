@@ -0,0 +1,274 @@
+"""Precompiled data snapshot for ChronoQuest.
+
+Builds one binary file holding everything app.py otherwise derives from airport-data.json and badges.json at
+startup:
+
+- the airport columns: lat, lon and distance from EFHK as raw arrays, the text columns marshaled
+- the serialized /api/main/airports payload (plain and gzip) and its ETag
+- the all-pairs distance matrix (float32)
+- the badge catalog entries
+
+app.py opens the file (CHRONO_SNAPSHOT, default .cache/data.snap) with a read-only memory map instead of parsing
+and computing. The arrays are used in place, so every worker process, forked or not, shares the same pages
+through the OS page cache. The file is versioned and checksummed (CRC-32 per section). It is ignored, with a
+warning, when it is damaged, from another format version, or older than its source files.
+
+Usage:
+    python snapshot.py build                      # after changing the airport data or badges.json
+    python snapshot.py build --no-matrix --output /srv/chronoquest/data.snap
+    python snapshot.py verify                     # check every section, including the distance matrix
+    python snapshot.py info
+"""
+import argparse
+import json
+import marshal
+import os
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from airports import AirportRegistry, AirportTable, load_airport_table
+from badges import BADGES_FILE, BadgeCatalog
+from distance import build_distance_matrix
+
+MAGIC = b'CQSNAP\0\0'
+FORMAT_VERSION = 1
+# magic, format version, header CRC-32, header offset, header length
+PREAMBLE = struct.Struct('<8sIIQQ')
+# Sections start on 64-byte boundaries so every array is aligned for NumPy
+ALIGN = 64
+# Helsinki-Vantaa (EFHK), the origin of the per-airport distances (same as app.EFHK_LAT / EFHK_LON)
+DEFAULT_ORIGIN = (60.317222, 24.963333)
+# Sections checked on every open; the distance matrix is only checked by verify() (it can be gigabytes)
+FAST_VERIFY = ('lat', 'lon', 'distance', 'columns', 'badges', 'airports_json', 'airports_gzip')
+
+
+class SnapshotError(Exception):
+    """A snapshot file is damaged, from another format version or doesn't match its sources."""
+
+
+def source_stamp(path):
+    """Size and modification time of a source file, used to notice a snapshot older than its sources."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    return {'path': str(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_snapshot(output, airports_file, badges_file=BADGES_FILE, origin=DEFAULT_ORIGIN, matrix=True):
+    """Write a snapshot of the given sources to output (atomically) and return its header."""
+    table, skipped = load_airport_table(airports_file, *origin)
+    registry = AirportRegistry(table)
+    with open(badges_file, 'r', encoding='utf-8') as f:
+        badge_entries = json.load(f)
+    BadgeCatalog(badge_entries)  # refuse to snapshot a catalog the server couldn't load
+
+    lat = np.frombuffer(table.lat, dtype=np.float64)
+    lon = np.frombuffer(table.lon, dtype=np.float64)
+    sections = {
+        'lat': lat,
+        'lon': lon,
+        'distance': np.asarray(table.distance, dtype=np.int64),
+        'columns': marshal.dumps(table.columns),
+        'badges': marshal.dumps(badge_entries),
+        'airports_json': registry.json_body,
+        'airports_gzip': registry.gzip_body,
+    }
+    header = {
+        'format': FORMAT_VERSION,
+        'created': time.time(),
+        'sources': [source_stamp(airports_file), source_stamp(badges_file)],
+        'origin': list(origin),
+        'airports': len(table),
+        'skipped': skipped,
+        'etag': registry.etag,
+        'sections': {},
+    }
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f'{output.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'w+b') as f:
+            f.write(b'\0' * PREAMBLE.size)
+            for name, value in sections.items():
+                data = value.tobytes() if isinstance(value, np.ndarray) else value
+                header['sections'][name] = _write_section(f, data, value)
+            if matrix:
+                header['sections']['matrix'] = _write_matrix(f, lat, lon)
+            header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+            header_offset = f.seek(0, os.SEEK_END)
+            f.write(header_bytes)
+            f.seek(0)
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, zlib.crc32(header_bytes), header_offset, len(header_bytes)))
+        os.replace(tmp, output)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return header
+
+
+def _pad(f):
+    offset = f.seek(0, os.SEEK_END)
+    if offset % ALIGN:
+        f.write(b'\0' * (ALIGN - offset % ALIGN))
+        offset = f.tell()
+    return offset
+
+
+def _write_section(f, data, value):
+    offset = _pad(f)
+    f.write(data)
+    section = {'offset': offset, 'size': len(data), 'crc32': zlib.crc32(data)}
+    if isinstance(value, np.ndarray):
+        section.update(dtype=value.dtype.str, shape=list(value.shape))
+    return section
+
+
+def _write_matrix(f, lat, lon):
+    """Build the distance matrix straight into the file, block by block (it never has to fit in memory)."""
+    n = len(lat)
+    offset = _pad(f)
+    size = n * n * 4
+    f.truncate(offset + size)
+    f.flush()
+    if n:
+        out = np.memmap(f, dtype=np.float32, mode='r+', offset=offset, shape=(n, n))
+        build_distance_matrix(lat, lon, out=out)
+        out.flush()
+        crc = zlib.crc32(out)
+        del out
+    else:
+        crc = 0
+    f.seek(0, os.SEEK_END)
+    return {'offset': offset, 'size': size, 'crc32': crc, 'dtype': np.dtype(np.float32).str, 'shape': [n, n]}
+
+
+class DataSnapshot:
+    """A snapshot file opened read-only through one shared memory map.
+
+    Arrays (lat, lon, distance, the distance matrix) are views of the map, not copies; the text columns, the API
+    payload and the badge entries are decoded into this process when asked for.
+    """
+
+    def __init__(self, path, verify=FAST_VERIFY):
+        self.path = Path(path)
+        try:
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        except ValueError:  # an empty file can't be mapped
+            raise SnapshotError(f'{self.path}: empty file') from None
+        if len(self._map) < PREAMBLE.size:
+            raise SnapshotError(f'{self.path}: truncated')
+        magic, version, header_crc, offset, length = PREAMBLE.unpack(self._map[:PREAMBLE.size].tobytes())
+        if magic != MAGIC:
+            raise SnapshotError(f'{self.path}: not a ChronoQuest data snapshot')
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f'{self.path}: format {version}, this server reads format {FORMAT_VERSION}')
+        header_bytes = self._map[offset:offset + length].tobytes()
+        if len(header_bytes) != length or zlib.crc32(header_bytes) != header_crc:
+            raise SnapshotError(f'{self.path}: damaged header')
+        self.header = json.loads(header_bytes)
+        self.sections = self.header['sections']
+        self.verify(verify)
+
+    def verify(self, names=None):
+        """Check the CRC-32 of the named sections (default: all of them)."""
+        for name in names if names is not None else self.sections:
+            section = self.sections.get(name)
+            if section is None:
+                continue
+            data = self._map[section['offset']:section['offset'] + section['size']]
+            if len(data) != section['size'] or zlib.crc32(data) != section['crc32']:
+                raise SnapshotError(f'{self.path}: section {name} is damaged')
+
+    def is_current(self, sources, origin):
+        """True when the snapshot was built from these source files (unchanged since) and this origin."""
+        stamps = {stamp['path']: stamp for stamp in self.header['sources']}
+        for path in sources:
+            try:
+                stamp = source_stamp(path)
+                if stamps.get(stamp['path']) != stamp:
+                    return False
+            except OSError:
+                return False
+        return self.header['origin'] == list(origin)
+
+    def array(self, name):
+        section = self.sections[name]
+        data = self._map[section['offset']:section['offset'] + section['size']]
+        return data.view(np.dtype(section['dtype'])).reshape(section['shape'])
+
+    def blob(self, name):
+        section = self.sections[name]
+        return self._map[section['offset']:section['offset'] + section['size']].tobytes()
+
+    def airport_table(self):
+        return AirportTable.from_arrays(self.array('lat'), self.array('lon'), self.array('distance'),
+                                        marshal.loads(self.blob('columns')))
+
+    def airport_registry(self, table):
+        return AirportRegistry(table, json_body=self.blob('airports_json'), gzip_body=self.blob('airports_gzip'),
+                               etag=self.header['etag'])
+
+    def badge_catalog(self):
+        return BadgeCatalog(marshal.loads(self.blob('badges')))
+
+    def distance_matrix(self):
+        """The all-pairs distance matrix (km), or None when the snapshot was built without it."""
+        return self.array('matrix') if 'matrix' in self.sections else None
+
+
+def open_snapshot(path, sources, origin=DEFAULT_ORIGIN):
+    """Open the snapshot at path for the given source files, or return None (with a warning) when it is missing,
+    damaged or stale, in which case the caller loads the sources itself."""
+    if not Path(path).exists():
+        return None
+    try:
+        snapshot = DataSnapshot(path)
+    except (SnapshotError, OSError, ValueError, KeyError) as exc:
+        print(f'Warning: ignoring data snapshot: {exc}')
+        return None
+    if not snapshot.is_current(sources, origin):
+        print(f'Warning: data snapshot {path} is older than its sources; rebuild it with `python snapshot.py build`')
+        return None
+    return snapshot
+
+
+def main(argv=None):
+    base = Path(__file__).parent
+    cache_dir = Path(os.environ.get('CHRONO_CACHE_DIR', base / '.cache'))
+    default_output = os.environ.get('CHRONO_SNAPSHOT', cache_dir / 'data.snap')
+    parser = argparse.ArgumentParser(description='Build or check the ChronoQuest data snapshot.')
+    parser.add_argument('command', choices=['build', 'verify', 'info'])
+    parser.add_argument('--output', default=default_output, help='snapshot file (default: CHRONO_SNAPSHOT or '
+                                                                  '.cache/data.snap)')
+    parser.add_argument('--airports', default=os.environ.get('CHRONO_AIRPORTS_FILE', base / 'airport-data.json'))
+    parser.add_argument('--badges', default=BADGES_FILE)
+    parser.add_argument('--no-matrix', action='store_true',
+                        help='leave out the distance matrix (it grows with the square of the airport count)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        header = build_snapshot(args.output, args.airports, args.badges, matrix=not args.no_matrix)
+        print(json.dumps({'output': str(args.output), 'airports': header['airports'], 'skipped': header['skipped'],
+                          'bytes': os.path.getsize(args.output),
+                          'seconds': round(time.perf_counter() - started, 2)}, indent=2))
+        return 0
+
+    try:
+        snapshot = DataSnapshot(args.output, verify=None if args.command == 'verify' else ())
+    except (SnapshotError, OSError) as exc:
+        print(f'Error: {exc}')
+        return 1
+    current = snapshot.is_current([args.airports, args.badges], DEFAULT_ORIGIN)
+    print(json.dumps({**snapshot.header, 'current': current}, indent=2))
+    return 0 if current or args.command == 'info' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# --- Spatial index over airports for ChronoQuest ---
+import heapq
+from math import sin
+
+import numpy as np
+
+from distance import R
+
+
+def to_unit_vectors(lats, lons):
+    """Convert latitude/longitude in degrees to 3D unit vectors (one row per point)."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def km_to_chord(km):
+    """Great-circle distance (km) -> straight-line distance between unit vectors."""
+    return 2 * sin(min(km / R, np.pi) / 2)
+
+
+def chord_to_km(chord):
+    """Straight-line distance between unit vectors -> great-circle distance (km). Works on arrays."""
+    return 2 * R * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class SpatialIndex:
+    """Static k-d tree over 3D unit vectors for nearest-airport and radius queries.
+
+    Points on the sphere are mapped to unit vectors, where the straight-line (chord) distance grows
+    monotonically with the great-circle distance; that lets an ordinary Euclidean k-d tree answer
+    geographic queries without special cases at the poles or the antimeridian. Leaves hold up to
+    leaf_size points and are scanned with NumPy. Points with NaN coordinates are left out.
+    """
+
+    def __init__(self, lats, lons, leaf_size=32):
+        points = to_unit_vectors(lats, lons)
+        valid = np.flatnonzero(~np.isnan(points).any(axis=1))
+        self.leaf_size = leaf_size
+        # Node arrays: each node covers order[start:end]; leaves have left == -1
+        self._start, self._end, self._left, self._right, self._lo, self._hi = [], [], [], [], [], []
+        self._order = valid
+        self._points = points[valid]
+        if len(valid):
+            self._build(0, len(valid))
+        # Reordered so every node's points are contiguous
+        self.ids = self._order
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build(self, start, end):
+        """Build the subtree over self._points[start:end] and return its node id."""
+        node = len(self._start)
+        block = self._points[start:end]
+        lo, hi = block.min(axis=0), block.max(axis=0)
+        self._start.append(start)
+        self._end.append(end)
+        self._lo.append(tuple(lo))
+        self._hi.append(tuple(hi))
+        self._left.append(-1)
+        self._right.append(-1)
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(hi - lo))
+            mid = (end - start) // 2
+            part = np.argpartition(block[:, axis], mid)
+            self._points[start:end] = block[part]
+            self._order[start:end] = self._order[start:end][part]
+            self._left[node] = self._build(start, start + mid)
+            self._right[node] = self._build(start + mid, end)
+        return node
+
+    def _box_distance_sq(self, node, q):
+        """Squared distance from point q to the bounding box of node (0 if inside)."""
+        d = 0.0
+        for qi, lo, hi in zip(q, self._lo[node], self._hi[node]):
+            if qi < lo:
+                d += (lo - qi) ** 2
+            elif qi > hi:
+                d += (qi - hi) ** 2
+        return d
+
+    def _leaf_distances_sq(self, node, q):
+        block = self._points[self._start[node]:self._end[node]]
+        return ((block - q) ** 2).sum(axis=1)
+
+    def query_radius(self, lat, lon, radius_km):
+        """Return (ids, distances_km) of all points within radius_km of lat/lon, nearest first."""
+        q = to_unit_vectors([lat], [lon])[0]
+        limit = km_to_chord(radius_km) ** 2
+        found_ids, found_d = [], []
+        stack = [0] if len(self) else []
+        while stack:
+            node = stack.pop()
+            if self._box_distance_sq(node, q) > limit:
+                continue
+            if self._left[node] == -1:
+                d = self._leaf_distances_sq(node, q)
+                hit = d <= limit
+                found_ids.append(self.ids[self._start[node]:self._end[node]][hit])
+                found_d.append(d[hit])
+            else:
+                stack.append(self._left[node])
+                stack.append(self._right[node])
+        if not found_ids:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        ids = np.concatenate(found_ids)
+        d = np.concatenate(found_d)
+        order = np.argsort(d, kind='stable')
+        return ids[order], chord_to_km(np.sqrt(d[order]))
+
+    def query_nearest(self, lat, lon, k, max_km=None):
+        """Return (ids, distances_km) of the k points nearest to lat/lon (optionally within max_km), nearest first."""
+        q = to_unit_vectors([lat], [lon])[0]
+        limit = km_to_chord(max_km) ** 2 if max_km is not None else np.inf
+        best = []  # max-heap of (-distance_sq, id) holding the k best so far
+        frontier = [(0.0, 0)] if len(self) and k > 0 else []
+        while frontier:
+            box_d, node = heapq.heappop(frontier)
+            bound = -best[0][0] if len(best) == k else limit
+            if box_d > bound:
+                break
+            if self._left[node] == -1:
+                d = self._leaf_distances_sq(node, q)
+                for dist, point_id in zip(d.tolist(), self.ids[self._start[node]:self._end[node]].tolist()):
+                    if dist > limit:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, point_id))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, point_id))
+            else:
+                for child in (self._left[node], self._right[node]):
+                    heapq.heappush(frontier, (self._box_distance_sq(child, q), child))
+        best.sort(reverse=True)
+        ids = np.array([point_id for _, point_id in best], dtype=np.intp)
+        return ids, chord_to_km(np.sqrt([-d for d, _ in best]))
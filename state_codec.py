@@ -0,0 +1,193 @@
+# --- Compact game state encoding for ChronoQuest ---
+import base64
+import json
+import zlib
+
+CODEC_VERSION = 1
+
+# Prefixes for the string form (used for save blobs): plain compact JSON or zlib-compressed, base64url-encoded
+TEXT_PREFIX = f'cq{CODEC_VERSION}:'
+ZLIB_PREFIX = f'cq{CODEC_VERSION}z:'
+
+# Full field name -> short tag
+TAGS = {
+    'playerName': 'p',
+    'credits': 'c',
+    'energy': 'e',
+    'currentLocation': 'l',
+    'fluxfire': 'f',
+    'fuel_to_make': 't',
+    'required_flux': 'r',
+}
+FIELDS = {tag: name for name, tag in TAGS.items()}
+
+# Fields with dedicated encodings (shards bitmask, paradox triple, history list) or derived on decode (countShards)
+SPECIAL = {'shards', 'paradox', 'countShards', 'history'}
+
+# Per-game history (engine.new_history) is packed as a list in this order, with last_action as an index into
+# ACTIONS
+HISTORY_FIELDS = ('travels', 'bandits', 'paradox_escapes', 'min_energy', 'range_bought', 'buy_range_uses',
+                  'buy_credits_uses', 'last_action')
+ACTIONS = (None, 'travel', 'buy_range', 'buy_credits')
+
+# Fields only the server needs (badge conditions read the history); left out of states sent to clients
+SERVER_ONLY = {'history'}
+
+NUM_SHARDS = 5
+
+
+def shards_to_mask(shards):
+    """{'1': True, '3': True} -> 0b00101."""
+    mask = 0
+    for key, collected in shards.items():
+        if collected:
+            mask |= 1 << (int(key) - 1)
+    return mask
+
+
+def mask_to_shards(mask):
+    """0b00101 -> {'1': True, '3': True}."""
+    return {str(i): True for i in range(1, NUM_SHARDS + 1) if mask & (1 << (i - 1))}
+
+
+def pack_history(history):
+    """{'travels': 3, ..., 'last_action': 'travel'} -> [3, ..., 1], or None when history has other fields."""
+    if set(history) != set(HISTORY_FIELDS) or history['last_action'] not in ACTIONS:
+        return None
+    return [history[name] for name in HISTORY_FIELDS[:-1]] + [ACTIONS.index(history['last_action'])]
+
+
+def unpack_history(values):
+    """Inverse of pack_history."""
+    history = dict(zip(HISTORY_FIELDS[:-1], values[:-1]))
+    history['last_action'] = ACTIONS[values[-1]]
+    return history
+
+
+def pack_state(gs):
+    """Return the compact dict form of a game state (short tags, shards bitmask, paradox and history as lists).
+
+    Fields the codec doesn't know about are kept verbatim under 'z', so newer state fields survive a round trip.
+    """
+    packed = {'v': CODEC_VERSION}
+    extra = {}
+    for name, value in gs.items():
+        if name in TAGS:
+            packed[TAGS[name]] = value
+        elif name not in SPECIAL:
+            extra[name] = value
+    packed['s'] = shards_to_mask(gs.get('shards', {}))
+    paradox = gs.get('paradox', {})
+    packed['x'] = [1 if paradox.get('active') else 0, paradox.get('coins', 0), paradox.get('startTime', 0)]
+    if 'history' in gs:
+        history = pack_history(gs['history'])
+        if history is not None:
+            packed['h'] = history
+        else:
+            extra['history'] = gs['history']
+    if extra:
+        packed['z'] = extra
+    return packed
+
+
+def unpack_state(packed):
+    """Inverse of pack_state."""
+    gs = {FIELDS[tag]: value for tag, value in packed.items() if tag in FIELDS}
+    shards = mask_to_shards(packed.get('s', 0))
+    gs['shards'] = shards
+    gs['countShards'] = len(shards)
+    active, coins, start_time = packed.get('x', (0, 0, 0))
+    gs['paradox'] = {'active': bool(active), 'coins': coins, 'startTime': start_time}
+    if 'h' in packed:
+        gs['history'] = unpack_history(packed['h'])
+    gs.update(packed.get('z', {}))
+    return gs
+
+
+def client_state(gs):
+    """The game state as sent to clients: without the server-only fields."""
+    if gs is None or not SERVER_ONLY.intersection(gs):
+        return gs
+    return {name: value for name, value in gs.items() if name not in SERVER_ONLY}
+
+
+def encode_state(gs, compress=None):
+    """Return a game state as a versioned string.
+
+    compress=True always uses zlib, False never does, and None (default) uses it only when the result is shorter.
+    """
+    text = json.dumps(pack_state(gs), separators=(',', ':'))
+    plain = TEXT_PREFIX + text
+    if compress is False:
+        return plain
+    packed = ZLIB_PREFIX + base64.urlsafe_b64encode(zlib.compress(text.encode('utf-8'), 9)).decode('ascii')
+    if compress or len(packed) < len(plain):
+        return packed
+    return plain
+
+
+def decode_state(data):
+    """Return a full game state dict from any stored form, or None.
+
+    Accepts the string form from encode_state, the compact dict from pack_state, and legacy full dicts
+    (sessions and saves written before the codec existed), which are returned unchanged.
+    """
+    if not data:
+        return None
+    if isinstance(data, str):
+        if data.startswith(ZLIB_PREFIX):
+            text = zlib.decompress(base64.urlsafe_b64decode(data[len(ZLIB_PREFIX):])).decode('utf-8')
+        elif data.startswith(TEXT_PREFIX):
+            text = data[len(TEXT_PREFIX):]
+        else:
+            raise ValueError('Unrecognized game state encoding')
+        data = json.loads(text)
+    if 'v' in data:
+        if data['v'] != CODEC_VERSION:
+            raise ValueError(f"Unsupported game state codec version: {data['v']}")
+        return unpack_state(data)
+    return data
+
+
+# --- Deltas between states ---
+
+def _pointer(path):
+    """JSON Pointer (RFC 6901) for a tuple of keys."""
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1') for key in path)
+
+
+def state_patch(old, new, _path=()):
+    """Return the JSON Patch (RFC 6902) operations that turn game state old into new.
+
+    Nested dicts (shards, paradox) are compared field by field; any other value is replaced whole.
+    """
+    ops = []
+    for key, value in new.items():
+        path = _path + (key,)
+        if key not in old:
+            ops.append({'op': 'add', 'path': _pointer(path), 'value': value})
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            ops.extend(state_patch(old[key], value, path))
+        elif old[key] != value or type(old[key]) is not type(value):
+            ops.append({'op': 'replace', 'path': _pointer(path), 'value': value})
+    for key in old:
+        if key not in new:
+            ops.append({'op': 'remove', 'path': _pointer(_path + (key,))})
+    return ops
+
+
+def apply_patch(gs, ops):
+    """Return a copy of gs with state_patch() operations applied (add, replace and remove on nested dicts)."""
+    gs = json.loads(json.dumps(gs))
+    for op in ops:
+        keys = [key.replace('~1', '/').replace('~0', '~') for key in op['path'].split('/')[1:]]
+        target = gs
+        for key in keys[:-1]:
+            target = target[key]
+        if op['op'] == 'remove':
+            del target[keys[-1]]
+        elif op['op'] in ('add', 'replace'):
+            target[keys[-1]] = op['value']
+        else:
+            raise ValueError(f"Unsupported patch operation: {op['op']}")
+    return gs
@@ -26,6 +26,7 @@ const statusCredits = document.getElementById('credits');
 const statusRange = document.getElementById('range');
 const statusShards = document.getElementById('shards');
 const statusFluxfire = document.getElementById('fluxfire');
+const statusParadox = document.getElementById('paradox-timer');
 const modal = document.getElementById('modal');
 const modalBody = document.getElementById('modal-body');
 const modalClose = document.getElementById('modal-close');
@@ -33,11 +34,15 @@ const btnHowTo = document.getElementById('btnHowTo');
 const btnBuyRange = document.getElementById('btnBuyRange');
 const btnBuyCredits = document.getElementById('btnBuyCredits');
 const btnBadges = document.getElementById('btnBadges');
+const btnPlan = document.getElementById('btnPlan');
 const btnReload = document.getElementById('btnReload'); // reload/reset
 
 let AIRPORTS = [];
 let markers = {};
 let visitedAirports = {};
+let STREAM_ID = null; // id of this page's /api/main/stream connection, sent with actions
+let STATE_VERSION = null; // server version of GAME_STATE; sent so responses can carry a patch instead of the state
+let planLine = null; // suggested route drawn on the map
 
 // ================= Modal helpers =================
 // showModal: Render provided HTML inside a centered modal and reveal it.
@@ -57,6 +62,7 @@ function renderStatus(){
   statusRange.textContent = `Range: ${GAME_STATE.energy}`;
   statusShards.textContent = `Shards: ${GAME_STATE.countShards}/5`;
   statusFluxfire.textContent = `Fluxfire: ${GAME_STATE.fluxfire}`;
+  if(statusParadox && !GAME_STATE.paradox?.active) statusParadox.hidden = true;
 }
 
 // ================= Load Airports =================
@@ -111,6 +117,57 @@ function markCurrentLocation(icao){
   }
 }
 
+// helper: move the highlighted pin from one airport to another (EFHK keeps its own icon).
+function moveMarker(oldIcao, newIcao){
+  if(oldIcao && oldIcao !== 'EFHK' && markers[oldIcao]){
+    markers[oldIcao].setIcon(L.icon({
+      iconUrl:'../static/img/black-dot.png',
+      iconSize:[32,32],
+      iconAnchor:[16,16]
+    }));
+  }
+  markCurrentLocation(newIcao);
+}
+
+// ================= Server state =================
+// applyState: replace GAME_STATE with the server's state, then refresh the HUD and map pin.
+// applyPatch: apply a state delta (JSON Patch operations: add/replace/remove by path) to a copy of an object.
+// applyResponse: take the new state from an API response, as a patch or as the full state, and its version.
+function applyState(next){
+  const oldLocation = GAME_STATE.currentLocation;
+  GAME_STATE = next;
+  renderStatus();
+  if(GAME_STATE.currentLocation !== oldLocation) moveMarker(oldLocation, GAME_STATE.currentLocation);
+}
+function applyPatch(target, ops){
+  const out = JSON.parse(JSON.stringify(target));
+  ops.forEach(op => {
+    const keys = op.path.split('/').slice(1).map(k => k.replace(/~1/g, '/').replace(/~0/g, '~'));
+    const last = keys.pop();
+    const parent = keys.reduce((obj, key) => obj[key], out);
+    if(op.op === 'remove') delete parent[last];
+    else parent[last] = op.value;
+  });
+  return out;
+}
+function applyResponse(data){
+  if(data.patch) applyState(applyPatch(GAME_STATE, data.patch));
+  else if(data.state) applyState(data.state);
+  if('version' in data) STATE_VERSION = data.version;
+}
+
+// Headers for API calls. While the event stream is open its id goes along, and the server answers
+// actions with a short acknowledgement because the events and state changes arrive on the stream.
+function apiHeaders(){
+  const headers = {'Content-Type':'application/json'};
+  if(STREAM_ID) headers['X-Chrono-Stream'] = STREAM_ID;
+  if(STATE_VERSION !== null) headers['X-State-Version'] = String(STATE_VERSION);
+  return headers;
+}
+function postJSON(url, body){
+  return fetch(url, {method:'POST', headers: apiHeaders(), body: JSON.stringify(body)});
+}
+
 // ================= Sidebar =================
 // Populate the sidebar with airport details and show the travel button
 // when the airport is not the player's current location.
@@ -137,84 +194,63 @@ document.addEventListener('click', e=>{
 // Send a travel request to the server, update local state from response,
 // animate marker icon changes, and present event outcomes in a modal.
 async function handleTravel(a){
-  const oldLocation = GAME_STATE.currentLocation;
-
-  const res = await fetch('/api/main/travel',{
-    method:'POST',
-    headers:{'Content-Type':'application/json'},
-    body: JSON.stringify({ICAO:a.ICAO})
-  });
+  const res = await postJSON('/api/main/travel', {ICAO:a.ICAO});
 
   if(res.status === 401){ window.location = '/start'; return; }
 
   const data = await res.json();
+  // Streamed: events, state changes and the result come in on the event stream
+  if(data.streamed) return;
 
-  if(data.state) GAME_STATE = data.state;
-
-  renderStatus();
-
-  // revert old location marker (except EFHK)
-  if(oldLocation && oldLocation !== 'EFHK' && markers[oldLocation]){
-    markers[oldLocation].setIcon(L.icon({
-      iconUrl:'../static/img/black-dot.png',
-      iconSize:[32,32],
-      iconAnchor:[16,16]
-    }));
-  }
-
-  // mark new location (except EFHK) with a highlighted pin
-  if(a.ICAO !== 'EFHK' && markers[a.ICAO]){
-    markers[a.ICAO].setIcon(L.icon({
-      iconUrl:'../static/img/country-pin.png',
-      iconSize:[32,32],
-      iconAnchor:[16,16]
-    }));
-    visitedAirports[a.ICAO] = true;
-  }
-
-  // handle events modal
-  if (data.events && data.events.length > 0) {
-    let html = '';
-    const onlyNothing = data.events.length === 1 && data.events[0].type === 'nothing';
-
-    if (onlyNothing) html += `<p>😐 Nothing happened at this airport.</p>`;
-    else data.events.forEach(ev => {
-      if (ev.type==='nothing') return;
-      if (ev.type==='shard') html+=`<p>✨ You found ChronoShard ${ev.shard}!</p><img src="../static/img/chronoshard${ev.shard}.png" style="max-width:80px;">`;
-      if (ev.type==='fluxfire') html+=`<p>🔥 You found Fluxfire!</p><img src="../static/img/fluxfire.png" style="max-width:80px;">`;
-      if (ev.type==='bandit') html+=`<p>💀 Bandits stole ${ev.amount} ${ev.subtype==='credits'?'credits':'range'}.</p>`;
-      if (ev.type==='credits') html+=`<p>💰 Gained ${ev.amount} credits.</p>`;
-      if (ev.type==='range') html+=`<p>🔋 Gained ${ev.amount} range.</p>`;
-      if (ev.type==='insufficient_range') html+=`<p>⚠️ ${ev.message}</p>`;
-      if (ev.type==='paradox') html+=`<p>⏳ Paradox Trap! Collect 3 coins to escape.</p>`;
-      if (ev.type==='paradox_coin') html+=`<p>Collected paradox coin ${ev.coins}/3</p>`;
-      if (ev.type==='paradox_escaped') html+=`<p>✅ Escaped Paradox Trap!</p>`;
-      if (ev.type==='lose') html+=`<p>💀 You lost. Redirecting...</p>`;
-      if (ev.type==='win') html+=`<p>🏆 You won! Fuel: ${ev.fuel}, Required Fluxfire: ${ev.required_flux}</p>`;
-      if (ev.type==='efhk_requirements_not_met') html+=`<p>❌ Can't land on EFHK yet. Need 5 shards & ${ev.required_flux} fluxfire</p>`;
-    });
-
-    showModal(html);
-  }
+  applyResponse(data);
+  if(data.events) showEvents(data.events);
 
-  // If trapped in a paradox, start a watchdog to auto-fail after 2 minutes.
-  // This gives the player time to collect paradox coins; if they remain trapped,
+  // Without a stream, watch the paradox timer here: if still trapped after 2 minutes,
   // notify and redirect to the end screen.
   if(GAME_STATE.paradox.active){
     if(!GAME_STATE.paradox.startTime) GAME_STATE.paradox.startTime = Date.now();
     setTimeout(()=>{
       const elapsed = Date.now() - GAME_STATE.paradox.startTime;
-      if(GAME_STATE.paradox.active && elapsed >= 2*60*1000){
-        GAME_STATE.paradox.active = false;
-        showModal(`<p>⏳ You were stuck in the Paradox Trap too long and lost!</p>`);
-        setTimeout(()=>window.location='/end',1500);
-      }
+      if(GAME_STATE.paradox.active && elapsed >= 2*60*1000) paradoxExpired();
     },1000);
   }
 
   if(data.win || data.lose) setTimeout(()=>window.location='/end',1500);
 }
 
+// Present travel event outcomes in a modal.
+function showEvents(events){
+  if (events.length === 0) return;
+  let html = '';
+  const onlyNothing = events.length === 1 && events[0].type === 'nothing';
+
+  if (onlyNothing) html += `<p>😐 Nothing happened at this airport.</p>`;
+  else events.forEach(ev => {
+    if (ev.type==='nothing') return;
+    if (ev.type==='shard') html+=`<p>✨ You found ChronoShard ${ev.shard}!</p><img src="../static/img/chronoshard${ev.shard}.png" style="max-width:80px;">`;
+    if (ev.type==='fluxfire') html+=`<p>🔥 You found Fluxfire!</p><img src="../static/img/fluxfire.png" style="max-width:80px;">`;
+    if (ev.type==='bandit') html+=`<p>💀 Bandits stole ${ev.amount} ${ev.subtype==='credits'?'credits':'range'}.</p>`;
+    if (ev.type==='credits') html+=`<p>💰 Gained ${ev.amount} credits.</p>`;
+    if (ev.type==='range') html+=`<p>🔋 Gained ${ev.amount} range.</p>`;
+    if (ev.type==='insufficient_range') html+=`<p>⚠️ ${ev.message}</p>`;
+    if (ev.type==='paradox') html+=`<p>⏳ Paradox Trap! Collect 3 coins to escape.</p>`;
+    if (ev.type==='paradox_coin') html+=`<p>Collected paradox coin ${ev.coins}/3</p>`;
+    if (ev.type==='paradox_escaped') html+=`<p>✅ Escaped Paradox Trap!</p>`;
+    if (ev.type==='lose') html+=`<p>💀 You lost. Redirecting...</p>`;
+    if (ev.type==='win') html+=`<p>🏆 You won! Fuel: ${ev.fuel}, Required Fluxfire: ${ev.required_flux}</p>`;
+    if (ev.type==='efhk_requirements_not_met') html+=`<p>❌ Can't land on EFHK yet. Need 5 shards & ${ev.required_flux} fluxfire</p>`;
+  });
+
+  showModal(html);
+}
+
+// Trapped in the paradox for too long: the game is lost.
+function paradoxExpired(){
+  GAME_STATE.paradox.active = false;
+  showModal(`<p>⏳ You were stuck in the Paradox Trap too long and lost!</p>`);
+  setTimeout(()=>window.location='/end',1500);
+}
+
 // ================= Buy Range =================
 // Show UI for purchasing energy using credits and call the buy API.
 // Validate input and update state on success.
@@ -233,9 +269,9 @@ btnBuyRange?.addEventListener('click',()=>{
   document.getElementById('buyRangeConfirm').addEventListener('click', async ()=>{
     const val = parseInt(document.getElementById('rangeCredits').value);
     if(isNaN(val) || val <= 0){ alert('Enter valid'); return; }
-    const res = await fetch('/api/buy/range', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({credits: val})});
+    const res = await postJSON('/api/buy/range', {credits: val});
     const data = await res.json();
-    if(data.ok){ GAME_STATE = data.state; renderStatus(); hideModal(); } else alert(data.error);
+    if(data.ok){ applyResponse(data); hideModal(); } else alert(data.error);
   });
 });
 
@@ -257,9 +293,9 @@ btnBuyCredits?.addEventListener('click', async ()=>{
   document.getElementById('buyCreditsConfirm').addEventListener('click', async ()=>{
     const val = parseInt(document.getElementById('buyCreditsInput').value);
     if(isNaN(val)||val<=0){alert('Enter valid'); return;}
-    const res = await fetch('/api/buy/credits',{method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({fluxfire: val})});
+    const res = await postJSON('/api/buy/credits', {fluxfire: val});
     const data = await res.json();
-    if(data.ok){ GAME_STATE = data.state; renderStatus(); hideModal(); } else alert(data.error);
+    if(data.ok){ applyResponse(data); hideModal(); } else alert(data.error);
   });
 });
 
@@ -275,6 +311,31 @@ btnBadges?.addEventListener('click', async ()=>{
   showModal(html);
 });
 
+// ================= Route planner =================
+// Ask the server for a tour from the current location back to EFHK that fits the player's energy, list its
+// stops and draw it on the map.
+btnPlan?.addEventListener('click', async ()=>{
+  const res = await fetch('/api/main/plan');
+  if(res.status === 401){ window.location = '/start'; return; }
+  const data = await res.json();
+  if(!res.ok){ alert(data.error); return; }
+  if(planLine){ planLine.remove(); planLine = null; }
+  if(!data.feasible){
+    showModal(`<h3>Plan Route</h3><p>Not enough range to get back to EFHK.</p>`);
+    return;
+  }
+  const costNote = data.cost_model === 'worst_case' ? ' (assuming the highest cost per flight)' : '';
+  let html = `<h3>Plan Route</h3><p>${data.stops.length} flights, ${data.energy_used} range${costNote}.</p><ol>`;
+  data.stops.forEach(s=>html+=`<li>${s.ICAO} ${s.name || ''} (-${s.cost}, ${s.energy_left} left)</li>`);
+  html+='</ol>';
+  showModal(html);
+  const points = [data.origin, ...data.stops.map(s=>s.ICAO)]
+    .map(icao=>AIRPORTS.find(a=>a.ICAO === icao))
+    .filter(a=>a && a.lat != null && a.lon != null)
+    .map(a=>[a.lat, a.lon]);
+  if(map && points.length > 1) planLine = L.polyline(points, {color:'#e6a700', dashArray:'6 6'}).addTo(map);
+});
+
 // ================= How to Play =================
 // Show a brief instructions modal describing core objectives and mechanics.
 btnHowTo?.addEventListener('click',()=>{
@@ -321,27 +382,72 @@ btnReload?.addEventListener('click', ()=>{
   window.location = '/start';
 });
 
+// ================= Event stream =================
+// One Server-Sent Events connection per page (/api/main/stream). The server sends the full state once,
+// then only what changes: travel events, versioned state deltas, badge awards, the game result and a paradox timer
+// tick every second while trapped. Resolves once the first state has arrived; rejects if the stream
+// can't be opened, in which case the page falls back to plain request/response.
+function connectStream(){
+  return new Promise((resolve, reject) => {
+    if(!window.EventSource){ reject(new Error('EventSource not supported')); return; }
+    const source = new EventSource('/api/main/stream');
+    let ready = false;
+    const on = (type, handler) => source.addEventListener(type, e => handler(JSON.parse(e.data)));
+
+    on('hello', data => { STREAM_ID = data.stream; });
+    on('state', data => {
+      applyState(data.state);
+      STATE_VERSION = data.version;
+      if(!ready){ ready = true; resolve(); }
+    });
+    on('delta', delta => {
+      // A delta only applies to the state it was made from; otherwise catch up with a fetch
+      if(delta.base !== STATE_VERSION) { fetchServerState(); return; }
+      applyState(applyPatch(GAME_STATE, delta.patch));
+      STATE_VERSION = delta.version;
+    });
+    on('events', showEvents);
+    on('badges', badges => {
+      const html = badges.map(b => `<p>🏅 New badge: <strong>${b.name}</strong> — ${b.desc}</p>`).join('');
+      setTimeout(() => showModal(html), 1200);
+    });
+    on('finish', () => setTimeout(()=>window.location='/end',1500));
+    on('paradox', tick => {
+      statusParadox.hidden = false;
+      statusParadox.textContent = `Paradox: ${tick.coins}/3 coins, ${tick.remaining}s left`;
+      if(tick.expired) paradoxExpired();
+    });
+    source.onerror = () => {
+      // The browser reconnects on its own; actions go without the stream id until it is back
+      STREAM_ID = null;
+      if(!ready){ source.close(); reject(new Error('event stream unavailable')); }
+    };
+  });
+}
+
 // ================= Server state fetch =================
-// Load the authoritative game state from the server session when the main UI starts.
-// If unauthorized, redirect to login.
+// Load the authoritative game state from the server session (when the main UI starts without a stream,
+// or to catch up); an up-to-date client gets an empty patch. If unauthorized, redirect to login.
 async function fetchServerState(){
   try{
-    const res = await fetch('/api/main/state');
+    const res = await fetch('/api/main/state', {headers: apiHeaders()});
     if(res.status === 401){ window.location = '/start'; return; }
-    if(res.ok){
-      const data = await res.json();
-      if(data.state) GAME_STATE = data.state;
-    }
+    if(res.ok) applyResponse(await res.json());
   } catch(err){ console.error('Error fetching server state', err); }
 }
 
 // ================= Initialize =================
-// Boot sequence: load airports, initialize map, fetch server state, render HUD,
-// mark the current location, and show fuel requirement notice if present.
+// Boot sequence: load airports, initialize map, get the server state (from the event stream, or a
+// one-off fetch if it can't be opened), render HUD, mark the current location,
+// and show fuel requirement notice if present.
 (async()=>{
   await loadAirports();
   initMap();
-  await fetchServerState();
+  try{
+    await connectStream();
+  } catch(err){
+    await fetchServerState();
+  }
   renderStatus();
   markCurrentLocation(GAME_STATE.currentLocation);
 
@@ -42,7 +42,7 @@ btnStart.addEventListener('click', async ()=>{
     });
     const loginData = await loginRes.json();
     if(loginData.ok){ window.location='/main'; }
-    else startMessage.textContent='Wrong password';
+    else startMessage.textContent=loginData.error || 'Wrong password';
   } else {
     // register a new user with the provided credentials
     const regRes = await fetch('/api/user/register',{
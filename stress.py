@@ -0,0 +1,139 @@
+"""Concurrency stress check for ChronoQuest user storage.
+
+Plays many games in parallel (several worker processes, each running several threads) against one shared
+user store through Flask's test client, hitting /api/main/travel, /api/buy/range and /api/buy/credits.
+Afterwards it re-reads the store and checks that every finished game is reflected in the win/loss/played
+counters, i.e. that no concurrent write was lost.
+
+Usage:
+    python stress.py --processes 4 --threads 4 --games 5
+    python stress.py --storage sqlite:////tmp/chronoquest-stress.db
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+DESTINATIONS = ['EGLL', 'KJFK', 'RJTT', 'OMDB', 'YSSY', 'LFPG', 'EDDF']
+MAX_STEPS_PER_GAME = 200
+
+
+def play_games(client, username, games, rng):
+    """Register username and play `games` games to completion. Returns (wins, loses)."""
+    client.post('/api/user/register', json={'name': username, 'password': 'stress'})
+    wins = loses = 0
+    for _ in range(games):
+        client.post('/api/user/login', json={'name': username, 'password': 'stress'})
+        state = client.get('/api/main/state').get_json()['state']
+        for _ in range(MAX_STEPS_PER_GAME):
+            if state['countShards'] == 5 and state['fluxfire'] >= state['required_flux']:
+                destination = 'EFHK'
+            else:
+                destination = rng.choice(DESTINATIONS)
+            res = client.post('/api/main/travel', json={'ICAO': destination})
+            data = res.get_json()
+            state = data['state']
+            if data.get('win'):
+                wins += 1
+                break
+            if data.get('lose'):
+                loses += 1
+                break
+            if res.status_code == 400:
+                # Out of energy: refuel with credits
+                data = client.post('/api/buy/range', json={'credits': min(state['credits'], 200)}).get_json()
+                state = data.get('state', state)
+            elif state['fluxfire'] > state['required_flux'] and rng.random() < 0.3:
+                data = client.post('/api/buy/credits', json={'fluxfire': 1}).get_json()
+                state = data.get('state', state)
+    return wins, loses
+
+
+def run_worker(storage_url, write_behind, prefix, threads, games, seed):
+    """Worker process: play games on `threads` threads, each with its own user. Returns {username: (wins, loses)}."""
+    os.environ['CHRONO_STORAGE'] = storage_url
+    os.environ['CHRONO_WRITE_BEHIND'] = '1' if write_behind else '0'
+    os.environ.setdefault('CHRONO_FLUSH_INTERVAL', '0.05')
+    # Every simulated player logs in from the same address; don't let the login limiter throttle the run
+    os.environ.setdefault('CHRONO_LOGIN_LIMIT_IP', '1000000,1000000')
+    os.environ.setdefault('CHRONO_LOGIN_LIMIT_USER', '1000000,1000000')
+    sys.path.insert(0, str(Path(__file__).parent))
+    import app as chrono
+
+    results = {}
+    errors = []
+
+    def thread_main(n):
+        username = f'{prefix}-t{n}'
+        try:
+            results[username] = play_games(chrono.app.test_client(), username, games, random.Random(seed + n))
+        except Exception as exc:  # reported by the parent
+            errors.append(f'{username}: {exc!r}')
+
+    workers = [threading.Thread(target=thread_main, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    # Pool workers exit without running atexit hooks, so flush write-behind changes explicitly
+    chrono.USER_STORE.flush()
+    if errors:
+        raise RuntimeError('; '.join(errors))
+    return results
+
+
+def load_counters(storage_url):
+    """Read the final counters straight from storage (bypassing any in-process cache)."""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from storage import open_user_store
+
+    store = open_user_store(storage_url, base=Path(__file__).parent)
+    return {u['playerName']: u for u in store.all()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stress concurrent ChronoQuest writes and check for lost updates.')
+    parser.add_argument('--processes', type=int, default=4, help='worker processes (default: 4)')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker process (default: 4)')
+    parser.add_argument('--games', type=int, default=3, help='games per simulated player (default: 3)')
+    parser.add_argument('--storage', help='storage URL (default: a fresh users.json in a temp directory)')
+    parser.add_argument('--write-behind', action='store_true', help='enable write-behind persistence in workers')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    storage_url = args.storage or 'json:///' + str(Path(tempfile.mkdtemp(prefix='chronoquest-stress-')) / 'users.json')
+    print(f'storage: {storage_url}')
+
+    expected = {}
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = [pool.submit(run_worker, storage_url, args.write_behind, f'stress{os.getpid()}-p{p}',
+                               args.threads, args.games, args.seed + 1000 * p)
+                   for p in range(args.processes)]
+        for future in futures:
+            expected.update(future.result())
+
+    users = load_counters(storage_url)
+    lost = []
+    for username, (wins, loses) in expected.items():
+        user = users.get(username)
+        if user is None:
+            lost.append(f'{username}: user record missing')
+            continue
+        got = (user.get('playerHowManyWins', 0), user.get('playerHowManyLoses', 0), user.get('playerHowManyTimesPlayed', 0))
+        if got != (wins, loses, wins + loses):
+            lost.append(f'{username}: expected wins/loses/played {(wins, loses, wins + loses)}, stored {got}')
+
+    finished = sum(w + l for w, l in expected.values())
+    print(json.dumps({'players': len(expected), 'finished_games': finished, 'lost_updates': len(lost)}))
+    for line in lost:
+        print('LOST', line)
+    return 1 if lost else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
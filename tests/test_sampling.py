@@ -0,0 +1,104 @@
+# --- Tests for the weighted event sampler ---
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from engine import EVENT_POPULATION, EVENT_WEIGHTS
+from sampling import WeightedSampler
+
+DRAWS = 20000
+# Chi-square critical values at p = 0.001, by degrees of freedom
+CHI2_CRITICAL = {3: 16.27, 4: 18.47, 5: 20.52, 6: 22.46, 7: 24.32, 8: 26.12, 9: 27.88}
+
+POPULATION = ('a', 'b', 'c', 'd', 'e')
+WEIGHTS = (1, 2, 3, 4, 10)
+
+
+def chi_square(counts, expected):
+    """Pearson's statistic for observed counts (a Counter) against expected probabilities (item -> p)."""
+    n = sum(counts.values())
+    return sum((counts[item] - n * p) ** 2 / (n * p) for item, p in expected.items())
+
+
+def first_draw_probabilities(population, weights):
+    total = sum(weights)
+    return {item: w / total for item, w in zip(population, weights) if w > 0}
+
+
+def second_draw_probabilities(population, weights):
+    """P(item comes second) when drawing by weight without replacement."""
+    total = sum(weights)
+    probs = dict.fromkeys((item for item, w in zip(population, weights) if w > 0), 0.0)
+    for i, wi in enumerate(weights):
+        for j, wj in enumerate(weights):
+            if i != j and wi > 0 and wj > 0:
+                probs[population[j]] += wi / total * wj / (total - wi)
+    return probs
+
+
+def assert_matches(counts, expected):
+    assert set(counts) <= set(expected)
+    assert chi_square(counts, expected) < CHI2_CRITICAL[len(expected) - 1]
+
+
+@pytest.mark.parametrize('population, weights', [(POPULATION, WEIGHTS), (EVENT_POPULATION, EVENT_WEIGHTS)])
+def test_single_draws_follow_weights(population, weights):
+    sampler = WeightedSampler(population, weights)
+    rng = random.Random(1)
+    counts = Counter(sampler.sample(1, rng)[0] for _ in range(DRAWS))
+    assert_matches(counts, first_draw_probabilities(population, weights))
+
+
+def test_draws_without_replacement_follow_weights():
+    sampler = WeightedSampler(POPULATION, WEIGHTS)
+    rng = random.Random(2)
+    samples = [sampler.sample(3, rng) for _ in range(DRAWS)]
+    assert_matches(Counter(s[0] for s in samples), first_draw_probabilities(POPULATION, WEIGHTS))
+    assert_matches(Counter(s[1] for s in samples), second_draw_probabilities(POPULATION, WEIGHTS))
+
+
+def test_samples_are_distinct():
+    sampler = WeightedSampler(POPULATION, WEIGHTS)
+    rng = random.Random(3)
+    for k in range(1, len(POPULATION) + 1):
+        for _ in range(500):
+            sample = sampler.sample(k, rng)
+            assert len(sample) == k
+            assert len(set(sample)) == k
+
+
+def test_zero_weights_are_never_drawn():
+    sampler = WeightedSampler(['x', 'y', 'z'], [0, 1, 3])
+    rng = random.Random(4)
+    for _ in range(1000):
+        sample = sampler.sample(3, rng)
+        assert 'x' not in sample
+        assert sorted(sample) == ['y', 'z']
+
+
+def test_batch_draws_follow_weights_and_are_distinct():
+    sampler = WeightedSampler(POPULATION, WEIGHTS)
+    batch = sampler.sample_batch(3, DRAWS, np.random.default_rng(5))
+    assert batch.shape == (DRAWS, 3)
+    assert all(len(set(row)) == 3 for row in batch.tolist())
+    assert_matches(Counter(POPULATION[i] for i in batch[:, 0]), first_draw_probabilities(POPULATION, WEIGHTS))
+    assert_matches(Counter(POPULATION[i] for i in batch[:, 1]), second_draw_probabilities(POPULATION, WEIGHTS))
+
+
+def test_batch_marks_unfillable_slots():
+    sampler = WeightedSampler(['x', 'y', 'z'], [0, 1, 3])
+    batch = sampler.sample_batch(3, 100, np.random.default_rng(6))
+    assert (batch[:, 2] == -1).all()
+    assert (batch[:, :2] != 0).all()
+
+
+def test_invalid_weights_are_rejected():
+    with pytest.raises(ValueError):
+        WeightedSampler(['a', 'b'], [1])
+    with pytest.raises(ValueError):
+        WeightedSampler(['a'], [-1])